@@ -0,0 +1,291 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""Render the output of the addon for many kickstart files without Anaconda.
+
+Every job parses one kickstart file and runs the installation task of the addon
+against one target directory. Documents of one kickstart file are written in
+parallel threads. No D-Bus service is involved. The jobs run in
+parallel in a pool of processes:
+
+    python3 -m org_fedora_hello_world.batch \\
+        --job ks1.cfg /srv/sysroot1 \\
+        --job ks2.cfg /srv/sysroot2
+
+More jobs can be read from a file with one pair of a kickstart file and a target
+directory per line, separated by whitespace.
+
+Only the %addon sections of this addon are read from the kickstart files, because
+everything else is handled by other Anaconda modules. The %include command is not
+supported.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pyanaconda.core.kickstart.specification import KickstartSpecificationHandler, \
+    KickstartSpecificationParser
+
+from org_fedora_hello_world.service.installation import HelloWorldInstallationTask, \
+    HelloWorldDocumentsInstallationTask, get_document_path
+from org_fedora_hello_world.service.kickstart import HelloWorldKickstartSpecification
+from org_fedora_hello_world.service.store import LineStore, encode_lines
+from org_fedora_hello_world.service.template import RenderPlan
+
+log = logging.getLogger(__name__)
+
+__all__ = ["run_job", "main"]
+
+ADDON_HEADER = "%addon org_fedora_hello_world"
+
+
+def read_addon_sections(path):
+    """Read the %addon sections of this addon from the given kickstart file.
+
+    Lines outside of the sections are replaced with empty lines, so the
+    line numbers in error messages are still valid.
+
+    :param path: a path to the kickstart file
+    :return: a string with the sections
+    """
+    lines = []
+    inside = False
+
+    with open(path) as f:
+        for line in f:
+            stripped = line.strip()
+
+            if not inside and stripped.split(maxsplit=2)[:2] == ADDON_HEADER.split():
+                inside = True
+            elif inside and stripped.startswith("%end"):
+                lines.append(line)
+                inside = False
+                continue
+
+            lines.append(line if inside else "\n")
+
+    return "".join(lines)
+
+
+def read_addon_data(path):
+    """Read the data of this addon from the given kickstart file.
+
+    :param path: a path to the kickstart file
+    :return: an instance of HelloWorldData
+    """
+    handler = KickstartSpecificationHandler(HelloWorldKickstartSpecification)
+    parser = KickstartSpecificationParser(handler, HelloWorldKickstartSpecification)
+    parser.readKickstartFromString(read_addon_sections(path))
+    return handler.addons.org_fedora_hello_world
+
+
+def _create_installation_task(sysroot, document):
+    """Create the installation task of the given document.
+
+    :param sysroot: a path to the target directory
+    :param document: an instance of HelloWorldDocumentData
+    :return: an instance of HelloWorldInstallationTask
+    """
+    path = get_document_path(document.name)
+    target_dir = os.path.dirname(os.path.join(sysroot, path))
+    os.makedirs(target_dir, exist_ok=True)
+
+    compression = None
+
+    if document.compress:
+        compression = (document.compress, document.compress_level)
+
+    lines = LineStore().create_view(encode_lines(document.lines))
+    plan = None
+
+    if document.template:
+        plan = RenderPlan.compile(lines, document.variables)
+
+    return HelloWorldInstallationTask(
+        sysroot,
+        document.reverse,
+        lines,
+        plan,
+        document.variables,
+        compression=compression,
+        path=path
+    )
+
+
+def run_job(kickstart, sysroot):
+    """Render the output of the addon for one kickstart file.
+
+    :param kickstart: a path to the kickstart file
+    :param sysroot: a path to the target directory
+    :return: a dictionary with the result and timing of the job
+    """
+    result = {"kickstart": kickstart, "sysroot": sysroot, "error": None}
+    start = time.perf_counter()
+
+    try:
+        data = read_addon_data(kickstart)
+        parsed = time.perf_counter()
+
+        tasks = [
+            _create_installation_task(sysroot, document)
+            for document in data.documents.values()
+        ]
+
+        if len(tasks) == 1:
+            tasks[0].run()
+        else:
+            HelloWorldDocumentsInstallationTask(sysroot, tasks).run()
+
+        installed = time.perf_counter()
+
+    except Exception as e:  # pylint: disable=broad-except
+        log.debug("The job for %s has failed.", kickstart, exc_info=True)
+        result["error"] = str(e).strip() or type(e).__name__
+        result["total"] = time.perf_counter() - start
+        return result
+
+    result["parse"] = parsed - start
+    result["install"] = installed - parsed
+    result["total"] = installed - start
+    return result
+
+
+def read_jobs_file(path):
+    """Read jobs from the given file.
+
+    :param path: a path to the file
+    :return: a list of pairs of a kickstart file and a target directory
+    """
+    jobs = []
+
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            fields = line.split()
+
+            if len(fields) != 2:
+                raise ValueError("Invalid job on line {} of {}.".format(line_number, path))
+
+            jobs.append(tuple(fields))
+
+    return jobs
+
+
+def print_report(results, stream=sys.stdout):
+    """Print a human-readable report of the results."""
+    row = "{:<6} {:>10} {:>10} {:>10}  {}"
+    stream.write(row.format("STATUS", "PARSE", "INSTALL", "TOTAL", "KICKSTART -> SYSROOT") + "\n")
+
+    for result in results:
+        stream.write(row.format(
+            "FAILED" if result["error"] else "OK",
+            _format_time(result.get("parse")),
+            _format_time(result.get("install")),
+            _format_time(result.get("total")),
+            "{} -> {}".format(result["kickstart"], result["sysroot"])
+        ) + "\n")
+
+        if result["error"]:
+            stream.write("       {}\n".format(result["error"]))
+
+
+def _format_time(seconds):
+    """Format the time in milliseconds."""
+    if seconds is None:
+        return "-"
+
+    return "{:.1f} ms".format(seconds * 1000)
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python3 -m org_fedora_hello_world.batch",
+        description="Render the output of the Hello World addon for many kickstart files."
+    )
+    parser.add_argument(
+        "--job", nargs=2, action="append", default=[], metavar=("KICKSTART", "SYSROOT"),
+        help="render the given kickstart file into the given target directory"
+    )
+    parser.add_argument(
+        "--jobs-file", metavar="PATH",
+        help="read pairs of a kickstart file and a target directory from a file"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="a number of parallel processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--json", action="store_true",
+        help="print the report in the JSON format"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="print debug messages"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the batch renderer.
+
+    :return: an exit code
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    jobs = [tuple(job) for job in args.job]
+
+    if args.jobs_file:
+        jobs.extend(read_jobs_file(args.jobs_file))
+
+    if not jobs:
+        sys.stderr.write("No jobs to run.\n")
+        return 2
+
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        kickstarts, sysroots = zip(*jobs)
+        results = list(executor.map(run_job, kickstarts, sysroots))
+
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result["error"])
+
+    if args.json:
+        report = {"jobs": results, "elapsed": elapsed, "failed": failed}
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_report(results)
+        print("{} jobs, {} failed, {:.1f} ms".format(len(results), failed, elapsed * 1000))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,7 +18,7 @@
 
 """This module contains constants that are used by various parts of the addon."""
 
-from dasbus.identifier import DBusServiceIdentifier
+from dasbus.identifier import DBusObjectIdentifier, DBusServiceIdentifier
 from pyanaconda.core.dbus import DBus
 from pyanaconda.modules.common.constants.namespaces import ADDONS_NAMESPACE
 
@@ -31,5 +31,31 @@ HELLO_WORLD = DBusServiceIdentifier(
     message_bus=DBus
 )
 
+# Named documents are published as child objects of this path, one per document.
+HELLO_WORLD_DOCUMENT = DBusObjectIdentifier(
+    namespace=HELLO_WORLD_NAMESPACE,
+    basename="Document"
+)
+
 # It's better to store paths without the initial slash "/" because of os.path.join behavior.
 HELLO_WORLD_FILE_PATH = "root/hello_world.txt"
+
+# The service state is saved here, so the service can restore it quickly after a restart.
+# The directory is private to the service. The path can be changed with the environment
+# variable of the service.
+HELLO_WORLD_CHECKPOINT_PATH = "/tmp/hello_world/checkpoint"
+HELLO_WORLD_CHECKPOINT_PATH_VARIABLE = "HELLO_WORLD_CHECKPOINT_PATH"
+
+# Kickstart content over the memory budget is saved to a checkpoint at this path and
+# mapped from there. The path has to be on a disk, because /tmp is kept in the memory
+# of the installation environment. There is no default path, so the content is rejected
+# unless the path is set with the environment variable of the service.
+HELLO_WORLD_SPILL_PATH_VARIABLE = "HELLO_WORLD_SPILL_PATH"
+
+# The default memory budget for the content of the service in bytes. It can be
+# changed with the environment variable of the service.
+HELLO_WORLD_MEMORY_BUDGET = 512 * 1024 * 1024
+HELLO_WORLD_MEMORY_BUDGET_VARIABLE = "HELLO_WORLD_MEMORY_BUDGET"
+
+# Named documents of the addon are written to these files.
+HELLO_WORLD_DOCUMENT_PATH = "root/hello_world_{name}.txt"
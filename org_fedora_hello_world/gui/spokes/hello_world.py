@@ -20,8 +20,10 @@
 
 """Module with the HelloWorldSpoke class."""
 
+import hashlib
 import logging
 
+from pyanaconda.modules.common.structures.validation import ValidationReport
 from pyanaconda.ui.gui import GUIObject
 from pyanaconda.ui.gui.spokes import NormalSpoke
 from pyanaconda.ui.common import FirstbootSpokeMixIn
@@ -91,6 +93,14 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalSpoke):
         self._entry = None
         self._reverse = None
 
+        # the state of the D-Bus module shown in the spoke
+        self._lines_digest = None
+        self._original_reverse = None
+
+        # the text of the D-Bus module or None if it has to be fetched again
+        self._text = None
+        self._hello_world_module.PropertiesChanged.connect(self._on_properties_changed)
+
     def initialize(self):
         """
         The initialize method that is called after the instance is created.
@@ -111,28 +121,45 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalSpoke):
 
         :see: pyanaconda.ui.common.UIObject.refresh
         """
-        lines = self._hello_world_module.Lines
-        self._entry.get_buffer().set_text("".join(lines))
+        text = self._get_text()
+        buf = self._entry.get_buffer()
+        buf.set_text(text)
+        buf.set_modified(False)
+        self._lines_digest = _get_digest(text)
 
         reverse = self._hello_world_module.Reverse
         self._reverse.set_active(reverse)
+        self._original_reverse = reverse
 
     def apply(self):
         """
         The apply method that is called when the spoke is left. It should
         update the D-Bus service with values set in the GUI elements.
+
+        Only the values changed by the user are sent to the D-Bus service.
         """
         buf = self._entry.get_buffer()
-        text = buf.get_text(
-            buf.get_start_iter(),
-            buf.get_end_iter(),
-            True
-        )
-        lines = text.splitlines(True)
-        self._hello_world_module.SetLines(lines)
+
+        if buf.get_modified():
+            text = buf.get_text(
+                buf.get_start_iter(),
+                buf.get_end_iter(),
+                True
+            )
+            digest = _get_digest(text)
+
+            # the text could be edited back to the original
+            if digest != self._lines_digest:
+                self._hello_world_module.SetLines(text.splitlines(True))
+                self._lines_digest = digest
+
+            buf.set_modified(False)
 
         reverse = self._reverse.get_active()
-        self._hello_world_module.SetReverse(reverse)
+
+        if reverse != self._original_reverse:
+            self._hello_world_module.SetReverse(reverse)
+            self._original_reverse = reverse
 
     def execute(self):
         """
@@ -163,7 +190,7 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalSpoke):
 
         :rtype: bool
         """
-        return bool(self._hello_world_module.Lines)
+        return bool(self._hello_world_module.OutputSize["lines"])
 
     @property
     def mandatory(self):
@@ -186,14 +213,35 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalSpoke):
 
         :rtype: str
         """
-        lines = self._hello_world_module.Lines
+        lines = self._hello_world_module.OutputSize["lines"]
 
         if not lines:
             return _("No text added")
+
+        report = ValidationReport.from_structure(self._hello_world_module.ValidationReport)
+
+        if not report.is_valid():
+            return _("Text is not valid: {}").format(report.error_messages[0])
         elif self._hello_world_module.Reverse:
-            return _("Text set with {} lines to reverse").format(len(lines))
+            return _("Text set with {} lines to reverse").format(lines)
         else:
-            return _("Text set with {} lines").format(len(lines))
+            return _("Text set with {} lines").format(lines)
+
+    def _get_text(self):
+        """Get the text of the D-Bus module.
+
+        The lines are fetched only if they changed since the last time.
+        """
+        if self._text is None:
+            self._text = "".join(self._hello_world_module.Lines)
+
+        return self._text
+
+    def _on_properties_changed(self, interface, changed, invalidated):
+        # pylint: disable=unused-argument
+        """Forget the text if the lines of the D-Bus module changed."""
+        if "Lines" in changed or "Lines" in invalidated:
+            self._text = None
 
     ### handlers ###
     def on_entry_icon_clicked(self, entry, *args):  # pylint: disable=unused-argument
@@ -210,6 +258,11 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalSpoke):
             dialog.run()
 
 
+def _get_digest(text):
+    """Get a digest of the text to detect changes."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
 class HelloWorldDialog(GUIObject):
     """
     Class for the sample dialog.
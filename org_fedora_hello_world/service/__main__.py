@@ -26,4 +26,5 @@ init()  # must be called before importing the service code
 # pylint:disable=wrong-import-position
 from org_fedora_hello_world.service.hello_world import HelloWorld
 service = HelloWorld()
+service.restore_checkpoint()
 service.run()
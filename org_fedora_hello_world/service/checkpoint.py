@@ -0,0 +1,394 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements an on-disk checkpoint of the service state.
+
+If the service is restarted, it can restore its state from the checkpoint instead of
+processing the kickstart file again. The checkpoint consists of three files:
+
+  * <path>.table - an identifier of the table and the UTF-8 encoded distinct lines
+  * <path>.index - an identifier of the table and end offsets of the lines in the table
+  * <path> - a header, metadata and indexes of the document lines to the table
+
+Both table files start with the identifier of the table, so a table that was
+replaced only partially is never used with a header of another table.
+
+The table files are only appended to when new distinct lines are stored, so every
+save writes only the new lines and the array of indexes. The files use the native
+byte order, because they are never moved to another machine.
+
+The files are restored with mmap, and the lines are copied from the mapped buffer only
+when they are read, so the restore takes the same time regardless of the size of
+the content.
+
+The directory of the checkpoint is created private to the service and existing files
+are never followed if they are symbolic links.
+"""
+
+import json
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import uuid
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+from org_fedora_hello_world.constants import HELLO_WORLD_CHECKPOINT_PATH, \
+    HELLO_WORLD_CHECKPOINT_PATH_VARIABLE, HELLO_WORLD_SPILL_PATH_VARIABLE
+from org_fedora_hello_world.service.store import ENCODING, LinesView
+
+log = logging.getLogger(__name__)
+
+__all__ = ["Checkpoint", "get_checkpoint_path", "get_spill_path"]
+
+MAGIC = b"HWCKPT03"
+
+# The magic, the table identifier, the number of table entries, the number
+# of lines, the encoded size of the lines and the size of the metadata.
+HEADER = struct.Struct("<8s16sQQQQ")
+
+# The size of the table identifier at the beginning of the table files.
+TABLE_ID_SIZE = 16
+
+# The size of an index of a line to the table.
+ID_SIZE = array("I").itemsize
+
+
+def get_checkpoint_path():
+    """Get the path to the checkpoint file of the default document.
+
+    :return: a path
+    """
+    return os.environ.get(HELLO_WORLD_CHECKPOINT_PATH_VARIABLE) or HELLO_WORLD_CHECKPOINT_PATH
+
+
+def get_spill_path():
+    """Get the path to the disk-backed checkpoint file of the default document.
+
+    :return: a path or None if it is not configured
+    """
+    return os.environ.get(HELLO_WORLD_SPILL_PATH_VARIABLE) or None
+
+
+class Checkpoint:
+    """An on-disk checkpoint of lines and metadata."""
+
+    def __init__(self, path):
+        """Create a new checkpoint.
+
+        :param path: a path to the checkpoint file
+        """
+        self._path = path
+        self._table = None
+        self._table_id = None
+        self._table_size = 0
+
+    @property
+    def path(self):
+        """A path to the checkpoint file."""
+        return self._path
+
+    def save(self, lines, metadata):
+        """Save the lines and metadata.
+
+        :param lines: an instance of LinesView
+        :param metadata: a JSON serializable dictionary
+        """
+        table = lines.table
+
+        if self._table is None:
+            _create_private_directory(os.path.dirname(os.path.abspath(self._path)))
+
+        if table is not self._table:
+            self._write_table(table)
+        elif len(table) > self._table_size:
+            self._append_table(table)
+
+        encoded_metadata = json.dumps(metadata).encode(ENCODING)
+        header = HEADER.pack(
+            MAGIC, self._table_id, self._table_size, len(lines), lines.size,
+            len(encoded_metadata)
+        )
+
+        def write(f):
+            f.write(header)
+            f.write(encoded_metadata)
+            f.write(b"\0" * _get_padding(HEADER.size + len(encoded_metadata)))
+            f.write(memoryview(lines.ids).cast("B"))
+
+        self._replace_file(self._path, write)
+
+    def _write_table(self, table):
+        """Write a new table of lines."""
+        table_id = uuid.uuid4().bytes
+        offsets = array("Q")
+        position = 0
+
+        def write_content(f):
+            nonlocal position
+            f.write(table_id)
+
+            for line in table:
+                f.write(line)
+                position += len(line)
+                offsets.append(position)
+
+        def write_index(f):
+            f.write(table_id)
+            f.write(offsets.tobytes())
+
+        # Replace the files, so the old ones can be still mapped by views.
+        self._replace_file(self._path + ".table", write_content)
+        self._replace_file(self._path + ".index", write_index)
+
+        self._table = table
+        self._table_id = table_id
+        self._table_size = len(offsets)
+
+    def _append_table(self, table):
+        """Append new lines of the table."""
+        offsets = array("Q")
+
+        with _open_append(self._path + ".table") as f:
+            content_id = f.read(TABLE_ID_SIZE)
+            position = f.seek(0, os.SEEK_END) - TABLE_ID_SIZE
+
+            if content_id != self._table_id:
+                raise OSError("The table of the checkpoint was replaced.")
+
+            for line in table[self._table_size:]:
+                f.write(line)
+                position += len(line)
+                offsets.append(position)
+
+        with _open_append(self._path + ".index") as f:
+            f.seek(0, os.SEEK_END)
+            f.write(offsets.tobytes())
+
+        self._table_size += len(offsets)
+
+    @staticmethod
+    def _replace_file(path, write):
+        """Atomically replace the file with a new one.
+
+        :param path: a path to the file
+        :param write: a function that writes the content to a file object
+        """
+        directory, name = os.path.split(path)
+        fd, temporary_path = tempfile.mkstemp(prefix=name + ".", dir=directory or ".")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def load(self):
+        """Load the lines and metadata.
+
+        :return: a tuple of an instance of LinesView and metadata or None
+        """
+        try:
+            return self._load()
+        except (OSError, ValueError, TypeError, struct.error) as e:
+            log.warning("Failed to load the checkpoint %s: %s", self._path, e)
+            return None
+
+    def _load(self):
+        """Load the checkpoint files."""
+        if not os.path.exists(self._path):
+            return None
+
+        document = _map_file(self._path)
+        magic, table_id, table_size, count, size, metadata_size = \
+            HEADER.unpack_from(document)
+
+        if magic != MAGIC:
+            raise ValueError("unknown format")
+
+        start = HEADER.size + metadata_size
+        metadata = json.loads(bytes(document[HEADER.size:start]).decode(ENCODING))
+        start += _get_padding(start)
+        ids = memoryview(document)[start:start + count * ID_SIZE].cast("I")
+
+        if len(ids) != count:
+            raise ValueError("truncated document")
+
+        table = self._load_table(table_id, table_size)
+        self._table = table
+        self._table_id = table_id
+        self._table_size = table_size
+        return LinesView(table, ids, size), metadata
+
+    def _load_table(self, table_id, table_size):
+        """Load the table files.
+
+        :param table_id: an expected identifier of the table
+        :param table_size: an expected number of lines in the table
+        :return: an instance of MappedTable
+        """
+        index = _map_file(self._path + ".index")
+
+        if bytes(index[:TABLE_ID_SIZE]) != table_id:
+            raise ValueError("mismatched table")
+
+        end = TABLE_ID_SIZE + table_size * 8
+        offsets = memoryview(index)[TABLE_ID_SIZE:end].cast("Q")
+        content = _map_file(self._path + ".table")
+
+        if bytes(content[:TABLE_ID_SIZE]) != table_id:
+            raise ValueError("mismatched table")
+
+        if len(offsets) != table_size or \
+                (table_size and offsets[-1] > len(content) - TABLE_ID_SIZE):
+            raise ValueError("truncated table")
+
+        return MappedTable(content, offsets, TABLE_ID_SIZE)
+
+    def remove(self):
+        """Remove the checkpoint files.
+
+        Views mapped from the files stay valid until they are released.
+        """
+        for path in (self._path, self._path + ".table", self._path + ".index"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        self._table = None
+        self._table_id = None
+        self._table_size = 0
+
+
+class MappedTable:
+    """A table of lines mapped from the checkpoint files.
+
+    Lines are copied from the buffer when they are read. Recently read lines
+    are cached, because the same distinct lines are usually read many times.
+    """
+
+    def __init__(self, content, offsets, start=0):
+        """Create a new table.
+
+        :param content: a buffer with encoded lines, for example a mmap object
+        :param offsets: a sequence of end offsets of the lines
+        :param start: an offset of the first line in the buffer
+        """
+        self._content = content
+        self._offsets = offsets
+        self._start = start
+        self._read = lru_cache(maxsize=4096)(self._read_line)
+
+    def _read_line(self, index):
+        start = self._offsets[index - 1] if index else 0
+        return bytes(self._content[self._start + start:self._start + self._offsets[index]])
+
+    def find(self, pattern):
+        """Find lines that contain the pattern.
+
+        The buffer is searched directly, so the lines are not copied.
+
+        :param pattern: an encoded pattern
+        :return: a list of indexes of the found lines
+        """
+        if not pattern:
+            return list(range(len(self)))
+
+        offsets = self._offsets
+        line_ids = []
+        position = self._content.find(pattern, self._start)
+
+        while position >= 0:
+            line_id = bisect_right(offsets, position - self._start)
+
+            if line_id >= len(offsets):
+                break
+
+            end = self._start + offsets[line_id]
+
+            # Skip matches that span two lines.
+            if position + len(pattern) > end:
+                position = self._content.find(pattern, position + 1)
+                continue
+
+            line_ids.append(line_id)
+            position = self._content.find(pattern, end)
+
+        return line_ids
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("table index out of range")
+
+        return self._read(index)
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+
+def _create_private_directory(path):
+    """Create a directory that is accessible only by the current user.
+
+    :param path: a path to the directory
+    :raise: OSError if the existing directory is not private
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() \
+            or stat.S_IMODE(info.st_mode) & 0o077:
+        raise OSError("The directory {} is not private.".format(path))
+
+
+def _open_append(path):
+    """Open the existing file for reading and appending without following symlinks."""
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_NOFOLLOW)
+    return os.fdopen(fd, "r+b")
+
+
+def _map_file(path):
+    """Map the given file into memory read-only."""
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+
+    with os.fdopen(fd, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return b""
+
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _get_padding(size):
+    """Get the size of padding needed to align the data."""
+    return -size % 8
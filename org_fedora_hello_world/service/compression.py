@@ -0,0 +1,175 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements compressed output of the hello world file.
+
+The lines are joined into chunks and compressed by the calling thread, while another
+thread writes the compressed chunks to the file. The compressors release GIL, so
+the compression and the writing run in parallel.
+"""
+
+import bz2
+import logging
+import lzma
+import queue
+import threading
+import zlib
+
+log = logging.getLogger(__name__)
+
+__all__ = ["COMPRESSION_METHODS", "get_compression_suffix", "check_compression_level",
+           "write_compressed"]
+
+# Supported methods with the file suffix, the range and the default of the level.
+COMPRESSION_METHODS = {
+    "gzip": (".gz", range(1, 10), 6),
+    "xz": (".xz", range(0, 10), 6),
+    "bz2": (".bz2", range(1, 10), 9),
+}
+
+# The size of compressed chunks.
+CHUNK_SIZE = 1024 * 1024
+
+# The number of compressed chunks waiting for the writer.
+QUEUE_SIZE = 8
+
+# The number of seconds to wait for a free place in the queue before
+# the writer is checked again.
+WRITER_TIMEOUT = 0.5
+
+
+def get_compression_suffix(method):
+    """Get the file suffix of the given compression method."""
+    return COMPRESSION_METHODS[method][0]
+
+
+def check_compression_level(method, level):
+    """Check the compression level of the given method.
+
+    :param method: a name of the compression method
+    :param level: a compression level or None for the default
+    :return: the compression level
+    :raise: ValueError if the level is not valid
+    """
+    _suffix, levels, default = COMPRESSION_METHODS[method]
+
+    if level is None:
+        return default
+
+    if level not in levels:
+        raise ValueError("The {} compression level must be between {} and {}.".format(
+            method, levels[0], levels[-1]
+        ))
+
+    return level
+
+
+def _create_compressor(method, level):
+    """Create a compressor object."""
+    if method == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    if method == "xz":
+        return lzma.LZMACompressor(preset=level)
+
+    return bz2.BZ2Compressor(level)
+
+
+def _join_chunks(lines):
+    """Join the lines into chunks of about the same size."""
+    chunk = []
+    size = 0
+
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+
+        if size >= CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _put_chunk(chunks, data, writer):
+    """Put the data into the queue of the writer.
+
+    The queue is bounded, so wait for a free place only while the writer runs.
+
+    :param chunks: a queue of the writer
+    :param data: compressed data or None to stop the writer
+    :param writer: a thread of the writer
+    :return: True if the data were queued, otherwise False
+    """
+    while writer.is_alive():
+        try:
+            chunks.put(data, timeout=WRITER_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def write_compressed(path, lines, method, level=None):
+    """Write the compressed lines to the file.
+
+    :param path: a path to the file
+    :param lines: an iterable of encoded lines
+    :param method: a name of the compression method
+    :param level: a compression level or None for the default
+    """
+    compressor = _create_compressor(method, check_compression_level(method, level))
+    chunks = queue.Queue(maxsize=QUEUE_SIZE)
+    errors = []
+
+    def write(f):
+        # Record any failure, the producer stops when the writer is gone.
+        try:
+            while True:
+                data = chunks.get()
+
+                if data is None:
+                    return
+
+                f.write(data)
+        except BaseException as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    with open(path, "wb") as f:
+        writer = threading.Thread(target=write, args=(f, ), name="HelloWorldWriter")
+        writer.start()
+
+        try:
+            for chunk in _join_chunks(lines):
+                data = compressor.compress(chunk)
+
+                if data and not _put_chunk(chunks, data, writer):
+                    break
+            else:
+                _put_chunk(chunks, compressor.flush(), writer)
+        finally:
+            _put_chunk(chunks, None, writer)
+            writer.join()
+
+    if errors:
+        raise errors[0]
+
+    log.debug("The compressed file was written to %s.", path)
@@ -0,0 +1,518 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements documents of the service.
+
+A document is the content of one file written by the addon. Every document has its
+own store of lines, checkpoint, history and validation, so documents don't affect
+each other. Only the memory budget of the service is shared by all documents. The
+default document has an empty name.
+"""
+
+import logging
+
+from pyanaconda.core.signal import Signal
+from pyanaconda.modules.common.errors.general import InvalidValueError
+
+from org_fedora_hello_world.constants import HELLO_WORLD_SPILL_PATH_VARIABLE
+from org_fedora_hello_world.service.checkpoint import Checkpoint, MappedTable
+from org_fedora_hello_world.service.history import History
+from org_fedora_hello_world.service.installation import HelloWorldInstallationTask, \
+    get_document_path
+from org_fedora_hello_world.service.kickstart import HelloWorldDocumentData
+from org_fedora_hello_world.service.log_utils import ContentSummary, RateLimitFilter
+from org_fedora_hello_world.service.memory import get_content_size, get_stored_size
+from org_fedora_hello_world.service.search import LineIndex, LineSearch
+from org_fedora_hello_world.service.store import ENCODING, ERRORS, LineStore, LinesView, \
+    encode_lines, decode_lines, split_content
+from org_fedora_hello_world.service.template import RenderPlan, TemplateError
+from org_fedora_hello_world.service.validation import LineValidator, ValidationRules
+
+log = logging.getLogger(__name__)
+
+# Changes of the content can come in bursts, so only their messages are rate limited.
+content_log = logging.getLogger(__name__ + ".content")
+content_log.addFilter(RateLimitFilter())
+
+__all__ = ["Document"]
+
+
+class Document:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    """A document of the HelloWorld service."""
+
+    def __init__(self, name, checkpoint_path, memory_budget, spill_path=None):
+        """Create a new document.
+
+        :param name: a name of the document or an empty string
+        :param checkpoint_path: a path to the checkpoint file
+        :param memory_budget: an instance of MemoryBudget shared by the documents
+        :param spill_path: a path to the disk-backed checkpoint file or None
+        """
+        self._name = name
+        self._reverse = False
+        self._store = LineStore()
+        self._index = None
+        self._search = LineSearch()
+        self._lines = LinesView()
+        self._variables = {}
+        self._plan = None
+        self._default_checkpoint = Checkpoint(checkpoint_path)
+        self._spill_checkpoint = Checkpoint(spill_path) if spill_path else None
+        self._checkpoint = self._default_checkpoint
+        self._validator = LineValidator(ValidationRules())
+        self._validation = (None, None)
+        self._compression = None
+        self._memory_budget = memory_budget
+        self._history = History()
+
+        self.reverse_changed = Signal()
+        self.lines_changed = Signal()
+
+    @property
+    def name(self):
+        """The name of the document."""
+        return self._name
+
+    @property
+    def path(self):
+        """The path of the file relative to the root of the installed system."""
+        return get_document_path(self._name)
+
+    def process_data(self, data):
+        """Process the kickstart data of the document.
+
+        :param data: an instance of HelloWorldDocumentData
+        """
+        self._reverse = data.reverse
+        self._lines = self._store.create_view(encode_lines(data.lines))
+        self._variables = data.variables
+        self._plan = None
+        self._set_rules(data.rules)
+        self._compression = None
+
+        if data.compress:
+            self._compression = (data.compress, data.compress_level)
+
+        # The template was checked by the kickstart parser. Compile it from
+        # the stored lines, so it shares them with the store.
+        if data.template:
+            self._plan = RenderPlan.compile(self._lines, self._variables)
+
+        # The kickstart file can't be rejected, so keep the content only on the disk.
+        if self._get_memory_usage(self._lines, self._plan) > \
+                self._memory_budget.get_available(self._name):
+            self._spill_lines()
+        else:
+            self._use_checkpoint(self._default_checkpoint)
+            self._save_checkpoint()
+
+        self._update_memory_usage()
+        self._history.add(self._lines, "kickstart", kickstart=True)
+
+    def setup_data(self):
+        """Get the kickstart data of the document.
+
+        :return: an instance of HelloWorldDocumentData
+        """
+        data = HelloWorldDocumentData(self._name)
+        data.reverse = self._reverse
+        data.lines = decode_lines(self._lines)
+        data.template = self._plan is not None
+        data.variables = self._variables
+        data.rules = self._validator.rules
+        data.compress, data.compress_level = self._compression or ("", None)
+        return data
+
+    @property
+    def reverse(self):
+        """Whether to reverse order of lines in the hello world file."""
+        return self._reverse
+
+    def set_reverse(self, reverse):
+        self._reverse = reverse
+        self._save_checkpoint()
+        self.reverse_changed.emit()
+        log.debug("Reverse is set to %s.", reverse)
+
+    @property
+    def lines(self):
+        """Encoded lines of the hello world file.
+
+        The lines are an immutable view of the store. It can be shared with
+        tasks without copying, because any change replaces the whole view.
+        """
+        return self._lines
+
+    @property
+    def content(self):
+        """The encoded content of the hello world file."""
+        return self._lines.to_bytes()
+
+    @property
+    def output_size(self):
+        """The size of the hello world file.
+
+        The size is counted when the lines are stored, so this is cheap.
+
+        :return: a tuple of the number of bytes and the number of lines
+        """
+        lines = self._lines
+        size = lines.size
+
+        # The installation task adds the missing line ending.
+        if lines and not lines[-1].endswith(b"\n"):
+            size += 1
+
+        return size, len(lines)
+
+    def get_lines_range(self, start, count):
+        """Get a range of lines of the hello world file.
+
+        :param start: an index of the first line
+        :param count: a maximal number of lines
+        :return: a list of lines
+        """
+        return decode_lines(self._lines[start:start + count])
+
+    def find_lines(self, pattern, limit=0):
+        """Find lines that contain the pattern.
+
+        The index of the store is created by the first search and updated
+        in the background, so the search doesn't wait for it. It is not
+        created if it doesn't fit into the memory budget.
+
+        :param pattern: a string
+        :param limit: a maximal number of found lines or 0 for all
+        :return: a sorted list of indexes of the found lines
+        """
+        pattern, = encode_lines([pattern])
+
+        if self._lines.table is self._store.table and self._index is None:
+            self._index = LineIndex()
+            self._update_memory_usage()
+
+        if self._lines.table is self._store.table and self._index is not None:
+            self._index.update(self._store.table, self._store.table_size)
+
+        return self._search.find(self._lines, pattern, self._index, limit)
+
+    @property
+    def validation_report(self):
+        """A validation report of the lines.
+
+        The report is created only once for every content. Only the lines
+        changed since the last report are checked, and every distinct line
+        is validated only once.
+
+        :return: an instance of ValidationReport
+        """
+        lines, report = self._validation
+
+        if lines is not self._lines:
+            report = self._validator.validate(self._lines)
+            self._validation = (self._lines, report)
+
+        return report
+
+    def _set_rules(self, rules):
+        """Set the validation rules."""
+        if rules != self._validator.rules:
+            self._validator = LineValidator(rules)
+            self._validation = (None, None)
+
+    def _check_memory_budget(self, size):
+        """Check that the content of the given size fits into the memory budget.
+
+        :param size: a size of the memory needed for the content in bytes
+        :raise: InvalidValueError if the content is too large
+        """
+        available = self._memory_budget.get_available(self._name)
+
+        if size > available:
+            raise InvalidValueError(
+                "The content needs {} bytes, but only {} bytes of the memory "
+                "budget are available.".format(size, available)
+            )
+
+    def _get_memory_usage(self, lines, plan):
+        """Get the memory used by the given content.
+
+        Lines mapped from the checkpoint are not kept in the memory.
+
+        :param lines: an instance of LinesView
+        :param plan: an instance of RenderPlan or None
+        :return: a number of bytes
+        """
+        size = plan.size if plan is not None else 0
+
+        if not isinstance(lines.table, MappedTable):
+            size += get_content_size(lines)
+
+        return size
+
+    def _update_memory_usage(self):
+        """Update the memory used by the document in the memory budget.
+
+        The index of the store is counted too. It is dropped if it doesn't
+        fit into the budget, so the search checks the lines directly.
+        """
+        size = self._get_memory_usage(self._lines, self._plan)
+
+        if self._index is not None:
+            index_size = LineIndex.estimate_size(self._store.table_size)
+
+            if size + index_size > self._memory_budget.get_available(self._name):
+                self._stop_index()
+            else:
+                size += index_size
+
+        self._memory_budget.update(self._name, size)
+
+    def release_memory(self):
+        """Release the memory budget used by the document."""
+        self._stop_index()
+        self._memory_budget.release(self._name)
+
+    def _stop_index(self):
+        """Stop the index, so it doesn't keep the table of the store."""
+        if self._index is not None:
+            self._index.stop()
+            self._index = None
+
+    def _spill_lines(self):
+        """Move the lines that don't fit into the memory budget to the disk.
+
+        The lines are saved to the disk-backed checkpoint and mapped from
+        there. The checkpoint in /tmp would keep them in the memory, so
+        the lines are dropped if the disk-backed checkpoint is not set.
+        """
+        available = self._memory_budget.get_available(self._name)
+        state = None
+
+        if self._spill_checkpoint is not None:
+            self._use_checkpoint(self._spill_checkpoint)
+
+            if self._save_checkpoint():
+                state = self._checkpoint.load()
+
+        if state is not None:
+            log.warning("The content of the document '%s' exceeds the available memory "
+                        "budget of %d bytes. It is mapped from %s.",
+                        self._name, available, self._checkpoint.path)
+            self._lines, _metadata = state
+        else:
+            log.error("The content of the document '%s' exceeds the available memory "
+                      "budget of %d bytes. It is dropped. Set %s to a path on a disk "
+                      "to keep it.", self._name, available, HELLO_WORLD_SPILL_PATH_VARIABLE)
+            self._lines = LinesView()
+            self._use_checkpoint(self._default_checkpoint)
+            self._save_checkpoint()
+
+        # Drop everything that refers to the lines in the memory.
+        self._store = LineStore()
+        self._search = LineSearch()
+        self._stop_index()
+        self._history.release_table()
+        self._validator = LineValidator(self._validator.rules)
+        self._validation = (None, None)
+
+        if self._plan is not None:
+            self._plan = RenderPlan.deferred(self._lines, self._variables)
+
+    def set_lines(self, lines):
+        encoded_lines = list(encode_lines(lines))
+        self._check_memory_budget(
+            get_stored_size(sum(map(len, encoded_lines)), len(encoded_lines))
+        )
+        self._set_view(self._store.create_view(encoded_lines), "lines")
+        content_log.debug("Lines is set to %s.", ContentSummary(lines, preview=80))
+
+    def set_content(self, content):
+        """Set the encoded content of the hello world file.
+
+        :param content: a bytes-like object
+        :raise: InvalidValueError if the content is too large, not UTF-8 encoded
+                or not a valid template
+        """
+        content = bytes(content)
+
+        try:
+            content.decode(ENCODING, ERRORS)
+        except UnicodeDecodeError as e:
+            raise InvalidValueError("The content is not valid {}: {}".format(
+                ENCODING, e
+            )) from None
+
+        lines = split_content(content)
+        self._check_memory_budget(get_stored_size(len(content), len(lines)))
+        self._set_view(self._store.create_view(lines), "content")
+        content_log.debug("Content is set to %s.", ContentSummary(self._lines, preview=80))
+
+    @property
+    def versions(self):
+        """Descriptions of the kept versions of the lines.
+
+        :return: a list of ContentVersion
+        """
+        return self._history.versions
+
+    def revert_to(self, number):
+        """Revert the lines to the given version.
+
+        The reverted lines are added to the history as a new version.
+
+        :param number: a number of the version
+        :raise: InvalidValueError if the version is not kept
+        """
+        try:
+            lines = self._history.get(number)
+        except KeyError:
+            raise InvalidValueError("Unknown version {}.".format(number)) from None
+
+        self._set_view(lines, "revert to {}".format(number))
+        log.debug("Lines is reverted to the version %d.", number)
+
+    def revert_to_kickstart(self):
+        """Revert the lines to the version from the kickstart file.
+
+        The version is not kept in the checkpoint, so it is not available
+        after the state was restored from the checkpoint.
+
+        :raise: InvalidValueError if there is no such version
+        """
+        number = self._history.kickstart_version
+
+        if number is None:
+            raise InvalidValueError(
+                "There is no version from the kickstart file. It is not kept "
+                "in the checkpoint of the service."
+            )
+
+        self.revert_to(number)
+
+    def _set_view(self, lines, origin):
+        """Set a new view of the lines.
+
+        :param lines: an instance of LinesView
+        :param origin: a description of the origin for the history
+        :raise: InvalidValueError if the lines are not a valid template
+        """
+        plan = self._plan
+
+        # The lines are a template if there is a render plan.
+        if plan is not None:
+            try:
+                plan = RenderPlan.compile(lines, self._variables)
+            except TemplateError as e:
+                raise InvalidValueError(str(e)) from None
+
+        self._check_memory_budget(self._get_memory_usage(lines, plan))
+        self._plan = plan
+        self._lines = lines
+        self._update_memory_usage()
+        self._history.add(lines, origin)
+        self._save_checkpoint()
+        self.lines_changed.emit()
+
+    def _use_checkpoint(self, checkpoint):
+        """Save the state to the given checkpoint from now on.
+
+        The previous checkpoint is removed, so it is never restored.
+
+        :param checkpoint: an instance of Checkpoint
+        """
+        if checkpoint is not self._checkpoint:
+            self._checkpoint.remove()
+            self._checkpoint = checkpoint
+
+    def _save_checkpoint(self):
+        """Save the current state to the checkpoint.
+
+        :return: True if the checkpoint was saved, otherwise False
+        """
+        metadata = {
+            "reverse": self._reverse,
+            "template": self._plan is not None,
+            "variables": self._variables,
+            "rules": self._validator.rules.to_dict(),
+            "compression": self._compression,
+        }
+
+        try:
+            self._checkpoint.save(self._lines, metadata)
+        except OSError as e:
+            log.warning("Failed to save the checkpoint: %s", e)
+            return False
+
+        return True
+
+    def restore_checkpoint(self):
+        """Restore the state from the checkpoint.
+
+        The lines are mapped from the checkpoint files and the template is
+        compiled when it is used, so this doesn't depend on the content size.
+
+        :return: True if the state was restored, otherwise False
+        """
+        for checkpoint in (self._default_checkpoint, self._spill_checkpoint):
+            state = checkpoint.load() if checkpoint is not None else None
+
+            if state is not None:
+                self._checkpoint = checkpoint
+                break
+        else:
+            return False
+
+        self._lines, metadata = state
+        self._reverse = metadata["reverse"]
+        self._variables = metadata["variables"]
+        self._set_rules(ValidationRules.from_dict(metadata.get("rules", {})))
+        compression = metadata.get("compression")
+        self._compression = tuple(compression) if compression else None
+        self._plan = None
+
+        if metadata["template"]:
+            self._plan = RenderPlan.deferred(self._lines, self._variables)
+
+        self._update_memory_usage()
+        self._history.add(self._lines, "checkpoint")
+        log.debug("Restored %d lines from %s.", len(self._lines), self._checkpoint.path)
+        return True
+
+    def remove_checkpoint(self):
+        """Remove the checkpoints of the document."""
+        self._default_checkpoint.remove()
+
+        if self._spill_checkpoint is not None:
+            self._spill_checkpoint.remove()
+
+    def create_installation_task(self, sysroot):
+        """Create a task that writes the document.
+
+        :param sysroot: a path to the root of the installed system
+        :return: an instance of HelloWorldInstallationTask
+        """
+        return HelloWorldInstallationTask(
+            sysroot,
+            self._reverse,
+            self._lines,
+            self._plan,
+            self._variables,
+            compression=self._compression,
+            path=self.path
+        )
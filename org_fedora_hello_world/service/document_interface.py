@@ -0,0 +1,227 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+import logging
+
+from dasbus.server.interface import dbus_interface
+from dasbus.server.property import emits_properties_changed
+from dasbus.server.template import InterfaceTemplate
+from dasbus.typing import *  # pylint: disable=wildcard-import,unused-wildcard-import
+
+from pyanaconda.core.glib import idle_add
+from pyanaconda.modules.common.structures.validation import ValidationReport
+
+from org_fedora_hello_world.constants import HELLO_WORLD_DOCUMENT
+from org_fedora_hello_world.service.history import ContentVersion
+from org_fedora_hello_world.service.store import decode_lines
+
+log = logging.getLogger(__name__)
+
+__all__ = ["DocumentInterfaceTemplate", "HelloWorldDocumentInterface"]
+
+
+class DocumentInterfaceTemplate(InterfaceTemplate):
+    """The template of interfaces for documents.
+
+    The template defines the properties and methods of a document. It is not
+    a D-Bus interface itself, so the members become part of the interfaces of
+    the subclasses.
+
+    Changes of properties are not emitted right away. All changes reported
+    within one iteration of the main loop are coalesced and emitted together
+    in a single PropertiesChanged signal. Properties with potentially large
+    values are only invalidated, so clients fetch them only when they need to.
+    """
+
+    # The name of the D-Bus interface with the properties of the document.
+    INTERFACE_NAME = None
+
+    # Properties that are announced only as invalidated, without the new value.
+    INVALIDATED_PROPERTIES = {"Lines", "Content", "ValidationReport"}
+
+    def __init__(self, implementation):
+        super().__init__(implementation)
+        self._invalidated_properties = set()
+        self._flush_scheduled = False
+
+    @property
+    def document(self):
+        """The document of the interface."""
+        return self.implementation
+
+    def connect_signals(self):
+        super().connect_signals()
+        self.watch_property("Reverse", self.document.reverse_changed)
+        self.watch_property("Lines", self.document.lines_changed)
+        self.watch_property("Content", self.document.lines_changed)
+        self.watch_property("OutputSize", self.document.lines_changed)
+        self.watch_property("ValidationReport", self.document.lines_changed)
+
+    def report_changed_property(self, property_name):
+        """Report a changed property.
+
+        :param property_name: a name of a DBus property
+        """
+        if property_name in self.INVALIDATED_PROPERTIES:
+            self._properties_changes.check_property(property_name)
+            self._invalidated_properties.add(property_name)
+        else:
+            super().report_changed_property(property_name)
+
+    def flush_changes(self):
+        """Schedule emission of the reported properties changes.
+
+        The changes are emitted once the main loop becomes idle, so several
+        changes made in a row result in one signal only.
+        """
+        if self._flush_scheduled:
+            return
+
+        self._flush_scheduled = True
+        idle_add(self._emit_changes)
+
+    def _emit_changes(self):
+        """Emit the coalesced properties changes.
+
+        :return: False to remove the idle source
+        """
+        self._flush_scheduled = False
+        changes = dict(self._properties_changes.flush())
+        invalidated = sorted(self._invalidated_properties)
+        self._invalidated_properties = set()
+
+        if invalidated:
+            changes.setdefault(self.INTERFACE_NAME, {})
+
+        # Emit one signal with the new values and the invalidated properties.
+        for interface, changed in changes.items():
+            if interface == self.INTERFACE_NAME:
+                self.PropertiesChanged(interface, changed, invalidated)
+            else:
+                self.PropertiesChanged(interface, changed, [])
+
+        return False
+
+    @property
+    def Reverse(self) -> Bool:
+        """Whether to reverse order of lines in the hello world file."""
+        return self.document.reverse
+
+    @emits_properties_changed
+    def SetReverse(self, reverse: Bool):
+        self.document.set_reverse(reverse)
+
+    @property
+    def Lines(self) -> List[Str]:
+        """Lines of the hello world file."""
+        return decode_lines(self.document.lines)
+
+    @property
+    def Content(self) -> List[Byte]:
+        """The UTF-8 encoded content of the hello world file.
+
+        This is faster than the Lines property for large content,
+        because the content is sent as a single array of bytes.
+        """
+        return self.document.content
+
+    @property
+    def OutputSize(self) -> Dict[Str, UInt64]:
+        """The size of the hello world file.
+
+        The keys are "bytes" and "lines".
+        """
+        size, count = self.document.output_size
+        return {"bytes": size, "lines": count}
+
+    @property
+    def ValidationReport(self) -> Structure:
+        """The validation report of the lines.
+
+        The lines are validated by the rules defined in the kickstart file.
+        """
+        return ValidationReport.to_structure(self.document.validation_report)
+
+    def GetLinesRange(self, start: UInt32, count: UInt32) -> List[Str]:
+        """Get a range of lines of the hello world file.
+
+        :param start: an index of the first line
+        :param count: a maximal number of lines to return
+        :return: a list of lines
+        """
+        return self.document.get_lines_range(start, count)
+
+    def FindLines(self, pattern: Str, limit: UInt32) -> List[UInt32]:
+        """Find lines of the hello world file that contain the pattern.
+
+        The pattern is a plain text, not a regular expression. The lines
+        are searched in the service, so they are not sent to the client.
+
+        :param pattern: a text to find
+        :param limit: a maximal number of found lines or 0 for all
+        :return: a sorted list of indexes of the found lines
+        """
+        return self.document.find_lines(pattern, limit)
+
+    @emits_properties_changed
+    def SetLines(self, lines: List[Str]):
+        self.document.set_lines(lines)
+
+    @emits_properties_changed
+    def SetContent(self, content: List[Byte]):
+        """Set the UTF-8 encoded content of the hello world file.
+
+        :param content: an array of bytes
+        """
+        self.document.set_content(content)
+
+    def ListVersions(self) -> List[Structure]:
+        """List the kept versions of the lines from the oldest one.
+
+        The history keeps a limited number of the latest versions and
+        the version from the kickstart file.
+
+        :return: a list of structures with descriptions of the versions
+        """
+        return ContentVersion.to_structure_list(self.document.versions)
+
+    @emits_properties_changed
+    def RevertTo(self, version: UInt32):
+        """Revert the lines to the given version.
+
+        :param version: a number of the version
+        """
+        self.document.revert_to(version)
+
+    @emits_properties_changed
+    def RevertToKickstart(self):
+        """Revert the lines to the version from the kickstart file.
+
+        The version is not available if the service restored
+        its state from the checkpoint.
+        """
+        self.document.revert_to_kickstart()
+
+
+@dbus_interface(HELLO_WORLD_DOCUMENT.interface_name)
+class HelloWorldDocumentInterface(DocumentInterfaceTemplate):
+    """The interface for a named document of HelloWorld.
+
+    Every named document is published as a separate object.
+    """
+
+    INTERFACE_NAME = HELLO_WORLD_DOCUMENT.interface_name
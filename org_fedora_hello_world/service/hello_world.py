@@ -15,6 +15,7 @@
 # License and may only be used or replicated with the express permission of
 # Red Hat, Inc.
 #
+import glob
 import logging
 
 from pyanaconda.core.configuration.anaconda import conf
@@ -22,12 +23,19 @@ from pyanaconda.core.dbus import DBus
 from pyanaconda.core.signal import Signal
 from pyanaconda.modules.common.base import KickstartService
 from pyanaconda.modules.common.containers import TaskContainer
+from pyanaconda.modules.common.errors.general import InvalidValueError
 
-from org_fedora_hello_world.constants import HELLO_WORLD
+from org_fedora_hello_world.constants import HELLO_WORLD, HELLO_WORLD_DOCUMENT
+from org_fedora_hello_world.service.checkpoint import get_checkpoint_path, get_spill_path
+from org_fedora_hello_world.service.document import Document
+from org_fedora_hello_world.service.document_interface import HelloWorldDocumentInterface
 from org_fedora_hello_world.service.hello_world_interface import HelloWorldInterface
 from org_fedora_hello_world.service.installation import HelloWorldConfigurationTask, \
-    HelloWorldInstallationTask
-from org_fedora_hello_world.service.kickstart import HelloWorldKickstartSpecification
+    HelloWorldDocumentsInstallationTask
+from org_fedora_hello_world.service.kickstart import HelloWorldKickstartSpecification, \
+    DOCUMENT_NAME_PATTERN
+from org_fedora_hello_world.service.memory import MemoryBudget, get_memory_report, \
+    get_memory_budget
 
 log = logging.getLogger(__name__)
 
@@ -36,20 +44,28 @@ class HelloWorld(KickstartService):
     """The HelloWorld D-Bus service.
 
     This class parses and stores data for the Hello world addon.
+
+    The data consist of documents. The default document has an empty name
+    and it always exists. Named documents are defined in the kickstart file.
+    All documents share one memory budget.
     """
 
     def __init__(self):
         super().__init__()
-        self._reverse = False
-        self._lines = []
-
-        self.reverse_changed = Signal()
-        self.lines_changed = Signal()
+        self._memory_budget = MemoryBudget(get_memory_budget())
+        self._documents = {"": self._create_document("")}
+        self._published = False
+        self.documents_changed = Signal()
 
     def publish(self):
         """Publish the module."""
         TaskContainer.set_namespace(HELLO_WORLD.namespace)
         DBus.publish_object(HELLO_WORLD.object_path, HelloWorldInterface(self))
+
+        for name in self.document_names:
+            self._publish_document(self._documents[name])
+
+        self._published = True
         DBus.register_service(HELLO_WORLD.service_name)
 
     @property
@@ -60,34 +76,121 @@ class HelloWorld(KickstartService):
     def process_kickstart(self, data):
         """Process the kickstart data."""
         log.debug("Processing kickstart data...")
-        self._reverse = data.addons.org_fedora_hello_world.reverse
-        self._lines = data.addons.org_fedora_hello_world.lines
+        documents = data.addons.org_fedora_hello_world.documents
+
+        # Forget the named documents that are not in the kickstart file.
+        for name in set(self._documents) - set(documents):
+            self._remove_document(name)
+
+        for name, document_data in documents.items():
+            if name not in self._documents:
+                self._add_document(self._create_document(name))
+
+            self._documents[name].process_data(document_data)
+
+        self.documents_changed.emit()
 
     def setup_kickstart(self, data):
         """Set the given kickstart data."""
         log.debug("Generating kickstart data...")
-        data.addons.org_fedora_hello_world.reverse = self._reverse
-        data.addons.org_fedora_hello_world.lines = self._lines
+        data.addons.org_fedora_hello_world.documents = {
+            name: document.setup_data() for name, document in self._documents.items()
+        }
 
-    @property
-    def reverse(self):
-        """Whether to reverse order of lines in the hello world file."""
-        return self._reverse
+    def _create_document(self, name):
+        """Create a new document.
 
-    def set_reverse(self, reverse):
-        self._reverse = reverse
-        self.reverse_changed.emit()
-        log.debug("Reverse is set to %s.", reverse)
+        The default document uses the original checkpoint file, so
+        the existing checkpoints are still restored.
+
+        :param name: a name of the document
+        :return: an instance of Document
+        """
+        return Document(
+            name,
+            _get_document_checkpoint_path(get_checkpoint_path(), name),
+            self._memory_budget,
+            _get_document_checkpoint_path(get_spill_path(), name)
+        )
 
     @property
-    def lines(self):
-        """Lines of the hello world file."""
-        return self._lines
+    def default(self):
+        """The default document."""
+        return self._documents[""]
+
+    @property
+    def document_names(self):
+        """Sorted names of the named documents."""
+        return sorted(name for name in self._documents if name)
+
+    def get_document_object_path(self, name):
+        """Get the D-Bus path of the named document.
+
+        :param name: a name of the document
+        :return: a D-Bus path
+        :raise: InvalidValueError if there is no such named document
+        """
+        if not name or name not in self._documents:
+            raise InvalidValueError("Unknown document {}.".format(name))
+
+        return _get_document_object_path(name)
+
+    def _add_document(self, document):
+        """Add a named document and publish it if the service is published."""
+        self._documents[document.name] = document
+
+        if self._published:
+            self._publish_document(document)
+
+    def _remove_document(self, name):
+        """Remove a named document, its D-Bus object and its checkpoint."""
+        document = self._documents.pop(name)
+
+        if self._published:
+            DBus.unpublish_object(_get_document_object_path(name))
 
-    def set_lines(self, lines):
-        self._lines = lines
-        self.lines_changed.emit()
-        log.debug("Lines is set to %s.", lines)
+        document.remove_checkpoint()
+        document.release_memory()
+
+    @staticmethod
+    def _publish_document(document):
+        """Publish the D-Bus object of a named document."""
+        DBus.publish_object(
+            _get_document_object_path(document.name),
+            HelloWorldDocumentInterface(document)
+        )
+
+    def get_memory_report(self, limit):
+        """Get a report of the memory usage.
+
+        :param limit: a maximal number of the top allocations
+        :return: an instance of MemoryReport
+        """
+        return get_memory_report(self._memory_budget, limit)
+
+    def restore_checkpoint(self):
+        """Restore the state from the checkpoints of the documents.
+
+        :return: True if the default document was restored, otherwise False
+        """
+        restored = self.default.restore_checkpoint()
+        names = set()
+
+        for path in filter(None, (get_checkpoint_path(), get_spill_path())):
+            prefix = path + "-"
+            names.update(found[len(prefix):] for found in glob.glob(glob.escape(prefix) + "*"))
+
+        for name in sorted(names):
+            if not DOCUMENT_NAME_PATTERN.match(name) or name in self._documents:
+                continue
+
+            document = self._create_document(name)
+
+            if document.restore_checkpoint():
+                self._add_document(document)
+
+        self.documents_changed.emit()
+        return restored
 
     def configure_with_tasks(self):
         """Return configuration tasks.
@@ -108,8 +211,32 @@ class HelloWorld(KickstartService):
         Anaconda's code automatically calls the ***_with_tasks methods and
         stores the returned ***Task instances to later execute their run() methods.
         """
-        task = HelloWorldInstallationTask(
-            conf.target.system_root,
-            self._reverse,
-            self._lines)
+        sysroot = conf.target.system_root
+        tasks = [
+            document.create_installation_task(sysroot)
+            for document in self._documents.values()
+        ]
+
+        if len(tasks) == 1:
+            return tasks
+
+        task = HelloWorldDocumentsInstallationTask(sysroot, tasks)
         return [task]
+
+
+def _get_document_checkpoint_path(path, name):
+    """Get the checkpoint path of the named document.
+
+    :param path: a checkpoint path of the default document or None
+    :param name: a name of the document
+    :return: a path or None
+    """
+    if not path or not name:
+        return path
+
+    return "{}-{}".format(path, name)
+
+
+def _get_document_object_path(name):
+    """Get the D-Bus path of the named document."""
+    return "{}/{}".format(HELLO_WORLD_DOCUMENT.object_path, name)
@@ -18,45 +18,67 @@
 import logging
 
 from dasbus.server.interface import dbus_interface
-from dasbus.server.property import emits_properties_changed
 from dasbus.typing import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
 from pyanaconda.modules.common.base import KickstartModuleInterface
 
 from org_fedora_hello_world.constants import HELLO_WORLD
+from org_fedora_hello_world.service.document_interface import DocumentInterfaceTemplate
+from org_fedora_hello_world.service.memory import MemoryReport
 
 log = logging.getLogger(__name__)
 
 
 @dbus_interface(HELLO_WORLD.interface_name)
-class HelloWorldInterface(KickstartModuleInterface):
+class HelloWorldInterface(KickstartModuleInterface, DocumentInterfaceTemplate):
     """The interface for HelloWorld.
 
     The interface class is needed for interfacing code running within
     Anaconda's main process and code running in the D-Bus service process. The
     dasbus library will automatically set up a D-Bus interface based on these
     classes.
+
+    The properties and methods of documents work with the default document.
+    Named documents are published as separate objects.
     """
 
+    INTERFACE_NAME = HELLO_WORLD.interface_name
+
+    @property
+    def document(self):
+        """The default document."""
+        return self.implementation.default
+
     def connect_signals(self):
         super().connect_signals()
-        self.watch_property("Reverse", self.implementation.reverse_changed)
-        self.watch_property("Lines", self.implementation.lines_changed)
+        self.watch_property("DocumentNames", self.implementation.documents_changed)
 
-    @property
-    def Reverse(self) -> Bool:
-        """Whether to reverse order of lines in the hello world file."""
-        return self.implementation.reverse
+    def GetMemoryReport(self, limit: UInt32) -> Structure:
+        """Get a report of the memory usage of the service.
 
-    @emits_properties_changed
-    def SetReverse(self, reverse: Bool):
-        self.implementation.set_reverse(reverse)
+        The allocations are traced only if the service runs with the
+        PYTHONTRACEMALLOC environment variable.
+
+        :param limit: a maximal number of the reported top allocations
+        :return: a structure with the report
+        """
+        return MemoryReport.to_structure(self.implementation.get_memory_report(limit))
 
     @property
-    def Lines(self) -> List[Str]:
-        """Lines of the hello world file."""
-        return self.implementation.lines
+    def DocumentNames(self) -> List[Str]:
+        """Names of the named documents.
+
+        The default document is not included.
+        """
+        return self.implementation.document_names
+
+    def GetDocument(self, name: Str) -> ObjPath:
+        """Get the object path of the named document.
+
+        The document has the same properties and methods as this
+        object, and they work with the content of the document.
 
-    @emits_properties_changed
-    def SetLines(self, lines: List[Str]):
-        self.implementation.set_lines(lines)
+        :param name: a name of the document
+        :return: a D-Bus path of the document
+        """
+        return self.implementation.get_document_object_path(name)
@@ -0,0 +1,297 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements a history of versions of the lines.
+
+A version is a view of the store. The table of distinct lines is already shared by
+all views, so a version has to keep only the indexes of its lines to the table. The
+indexes are split into chunks of a fixed number of lines, and equal chunks are stored
+only once, so versions share the chunks that haven't changed. A new version is
+compared with the previous one chunk by chunk, and only the changed chunks are
+copied and looked up.
+
+If the store replaces its table with a compact one, the older versions move to
+a private table with only the lines they use, so the replaced table can be freed.
+
+The history keeps a limited number of the latest versions. The version from the
+kickstart file is kept regardless of the limit.
+"""
+
+import time
+import weakref
+from array import array
+
+from dasbus.structure import DBusData
+from dasbus.typing import *  # pylint: disable=wildcard-import,unused-wildcard-import
+
+from org_fedora_hello_world.service.store import LinesView
+
+__all__ = ["ContentVersion", "History"]
+
+
+class ContentVersion(DBusData):  # pylint: disable=too-many-instance-attributes
+    """A description of a version of the lines."""
+
+    def __init__(self):
+        self._number = 0
+        self._origin = ""
+        self._timestamp = 0
+        self._lines = 0
+
+    @property
+    def number(self) -> UInt32:
+        """The number of the version."""
+        return self._number
+
+    @number.setter
+    def number(self, value: UInt32):
+        self._number = value
+
+    @property
+    def origin(self) -> Str:
+        """The origin of the version.
+
+        For example: kickstart, checkpoint, lines, content or revert.
+        """
+        return self._origin
+
+    @origin.setter
+    def origin(self, value: Str):
+        self._origin = value
+
+    @property
+    def timestamp(self) -> UInt64:
+        """The time of the creation of the version in seconds since the epoch."""
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value: UInt64):
+        self._timestamp = value
+
+    @property
+    def lines(self) -> UInt64:
+        """The number of lines."""
+        return self._lines
+
+    @lines.setter
+    def lines(self, value: UInt64):
+        self._lines = value
+
+
+class _Snapshot:
+    """A stored version of the lines."""
+
+    __slots__ = ("version", "table", "chunks", "size", "ids")
+
+    def __init__(self, version, table, chunks, size, ids):
+        self.version = version
+        self.table = table
+        self.chunks = chunks
+        self.size = size
+        # A weak reference to the array of indexes or None.
+        self.ids = ids
+
+    def get_ids(self):
+        """Get the array of indexes if it is still used by a view."""
+        return self.ids() if self.ids else None
+
+
+class History:
+    """A bounded history of versions of the lines."""
+
+    # The number of lines in a chunk of indexes.
+    CHUNK_SIZE = 1024
+
+    def __init__(self, limit=16):
+        """Create a new history.
+
+        :param limit: a maximal number of kept versions
+        """
+        self._limit = limit
+        self._snapshots = []
+        self._kickstart = None
+        self._chunks = {}
+        self._table = None
+        self._last_number = 0
+
+    @property
+    def versions(self):
+        """Descriptions of the kept versions from the oldest one.
+
+        :return: a list of ContentVersion
+        """
+        return [snapshot.version for snapshot in self._get_snapshots()]
+
+    @property
+    def kickstart_version(self):
+        """The number of the version from the kickstart file or None."""
+        return self._kickstart.version.number if self._kickstart else None
+
+    def add(self, lines, origin, kickstart=False):
+        """Add a new version of the lines.
+
+        :param lines: an instance of LinesView
+        :param origin: a description of the origin of the version
+        :param kickstart: is it the version from the kickstart file?
+        :return: the number of the version
+        """
+        self._last_number += 1
+
+        version = ContentVersion()
+        version.number = self._last_number
+        version.origin = origin
+        version.timestamp = int(time.time())
+        version.lines = len(lines)
+
+        previous = self._snapshots[-1] if self._snapshots else None
+
+        if previous and previous.table is lines.table and previous.get_ids() is lines.ids:
+            chunks = previous.chunks
+        elif previous and previous.table is lines.table:
+            chunks = self._split_chunks(lines.ids, previous.chunks)
+        else:
+            chunks = self._split_chunks(lines.ids)
+
+        snapshot = _Snapshot(version, lines.table, chunks, lines.size, weakref.ref(lines.ids))
+        self._snapshots.append(snapshot)
+
+        if kickstart:
+            self._kickstart = snapshot
+
+        if len(self._snapshots) > self._limit:
+            del self._snapshots[:-self._limit]
+            self._collect_chunks()
+
+        # Tables of the store are lists. Other tables are private tables of
+        # the history or tables mapped from the checkpoint.
+        if isinstance(lines.table, list) and lines.table is not self._table:
+            self._table = lines.table
+            self._detach_tables()
+
+        return version.number
+
+    def get(self, number):
+        """Get the given version of the lines.
+
+        :param number: a number of the version
+        :return: an instance of LinesView
+        :raise: KeyError if the version is not kept
+        """
+        for snapshot in self._get_snapshots():
+            if snapshot.version.number != number:
+                continue
+
+            # Reuse the indexes if they are still used by a view.
+            ids = snapshot.get_ids()
+
+            if ids is None:
+                ids = array("I")
+                ids.frombytes(b"".join(snapshot.chunks))
+                snapshot.ids = weakref.ref(ids)
+
+            return LinesView(snapshot.table, ids, snapshot.size)
+
+        raise KeyError(number)
+
+    def release_table(self):
+        """Stop sharing the table of the store.
+
+        Kept versions are moved to private tables with only their own
+        lines, so the table of the store can be freed.
+        """
+        self._table = None
+        self._detach_tables()
+
+    def _get_snapshots(self):
+        """Get the kept snapshots from the oldest one."""
+        snapshots = list(self._snapshots)
+
+        if self._kickstart and self._kickstart not in snapshots:
+            snapshots.insert(0, self._kickstart)
+
+        return snapshots
+
+    def _split_chunks(self, ids, previous=()):
+        """Split the indexes into shared chunks.
+
+        :param ids: an array or a memoryview of indexes
+        :param previous: chunks of the previous version of the same table
+        :return: a tuple of chunks
+        """
+        data = memoryview(ids).cast("B")
+        step = self.CHUNK_SIZE * ids.itemsize
+        chunks = []
+
+        for number, start in enumerate(range(0, len(data), step)):
+            chunk = bytes(data[start:start + step])
+
+            # Reuse the chunk of the previous version if it hasn't changed.
+            if number < len(previous) and chunk == previous[number]:
+                chunks.append(previous[number])
+                continue
+
+            chunks.append(self._chunks.setdefault(chunk, chunk))
+
+        return tuple(chunks)
+
+    def _collect_chunks(self):
+        """Forget chunks that are not used by any kept version."""
+        self._chunks = {}
+
+        for snapshot in self._get_snapshots():
+            for chunk in snapshot.chunks:
+                self._chunks[chunk] = chunk
+
+    def _detach_tables(self):
+        """Move versions of replaced tables of the store to private tables."""
+        replaced = {}
+
+        for snapshot in self._get_snapshots():
+            if isinstance(snapshot.table, list) and snapshot.table is not self._table:
+                replaced.setdefault(id(snapshot.table), []).append(snapshot)
+
+        for snapshots in replaced.values():
+            self._detach(snapshots)
+
+        if replaced:
+            self._collect_chunks()
+
+    @staticmethod
+    def _detach(snapshots):
+        """Move the versions of one table to a private table.
+
+        The private table has only the lines used by the versions. It is
+        a tuple, so it is never mistaken for a table of the store.
+
+        :param snapshots: a list of snapshots of the same table
+        """
+        table = snapshots[0].table
+        chunks = {chunk for snapshot in snapshots for chunk in snapshot.chunks}
+        line_ids = sorted(set().union(*(array("I", chunk) for chunk in chunks)))
+        mapping = dict(zip(line_ids, range(len(line_ids))))
+        private_table = tuple(table[line_id] for line_id in line_ids)
+
+        remapped = {
+            chunk: array("I", map(mapping.__getitem__, array("I", chunk))).tobytes()
+            for chunk in chunks
+        }
+
+        for snapshot in snapshots:
+            snapshot.table = private_table
+            snapshot.chunks = tuple(remapped[chunk] for chunk in snapshot.chunks)
+            snapshot.ids = None
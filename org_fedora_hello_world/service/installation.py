@@ -37,11 +37,19 @@ Every kind of task has the run() method that performs the actual work.
 """
 
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 from os.path import normpath, join as joinpath
 
+from pyanaconda.modules.common.errors.installation import InstallationError
 from pyanaconda.modules.common.task import Task
 
-from org_fedora_hello_world.constants import HELLO_WORLD_FILE_PATH
+from org_fedora_hello_world.constants import HELLO_WORLD_FILE_PATH, HELLO_WORLD_DOCUMENT_PATH
+from org_fedora_hello_world.service.compression import get_compression_suffix, \
+    write_compressed
+from org_fedora_hello_world.service.log_utils import ContentSummary
+from org_fedora_hello_world.service.template import get_builtin_variables
 
 log = logging.getLogger(__name__)
 
@@ -59,7 +67,9 @@ class HelloWorldConfigurationTask(Task):
     def run(self):
         """The run method performs the actual work.
 
-        No actions happen in this addon.
+        No actions happen in this addon. The free space for the hello world
+        files is checked by the installation tasks, because the target system
+        is not mounted yet when configuration tasks run.
         """
         log.info("Running configuration task.")
 
@@ -70,28 +80,209 @@ class HelloWorldInstallationTask(Task):
     This task runs at end of installation.
     """
 
-    def __init__(self, sysroot, reverse, lines):
+    # pylint: disable=too-many-arguments
+    def __init__(self, sysroot, reverse, lines, plan=None, variables=None, *,
+                 compression=None, path=HELLO_WORLD_FILE_PATH):
+        """Create a new task.
+
+        :param sysroot: a path to the root of the installed system
+        :param reverse: should the lines be written in the reversed order?
+        :param lines: an instance of LinesView to write; it is never modified
+        :param plan: a render plan of the lines or None if they are not a template
+        :param variables: a dictionary of variables defined for the template
+        :param compression: a tuple of a compression method and level or None
+        :param path: a path of the file relative to the root of the installed system
+        """
         super().__init__()
         self._sysroot = sysroot
         self._reverse = reverse
         self._lines = lines
+        self._plan = plan
+        self._variables = dict(variables or {})
+        self._compression = compression
+        self._path = path
 
     @property
     def name(self):
         return "Install HelloWorld"
 
+    @property
+    def path(self):
+        """The path of the file relative to the root of the installed system."""
+        return self._path
+
+    def get_size(self):
+        """Get the maximal size of the written file.
+
+        :return: a number of bytes
+        """
+        lines = self._lines
+        size = lines.size
+
+        # The missing line ending is added.
+        if lines and not lines[-1].endswith(b"\n"):
+            size += 1
+
+        if self._plan is not None:
+            size += self._plan.estimate_growth(self._get_values())
+
+        return size
+
     def run(self):
-        """The run method performs the actual work."""
+        """The run method performs the actual work.
+
+        Check that there is enough space for the file on the mounted
+        target system, so a partial file is not written.
+        """
         log.info("Running installation task.")
-        hello_file_path = normpath(joinpath(self._sysroot, HELLO_WORLD_FILE_PATH))
-        log.debug("Writing hello world file to: %s", hello_file_path)
+        check_free_space(self._sysroot, {self._path: self.get_size()})
+        self.write()
+
+    def write(self):
+        """Write the file."""
+        hello_file_path = normpath(joinpath(self._sysroot, self._path))
+
+        if self._compression:
+            hello_file_path += get_compression_suffix(self._compression[0])
+
+        log.debug("Writing %s to: %s", ContentSummary(self._lines), hello_file_path)
+
+        if self._plan is not None:
+            iterator = self._render_template()
+        else:
+            iterator = self._get_lines()
+
+        if self._compression:
+            method, level = self._compression
+            write_compressed(hello_file_path, iterator, method, level)
+            return
+
+        with open(hello_file_path, "wb") as hello_file:
+            hello_file.writelines(iterator)
+
+    def _get_lines(self):
+        """Get an iterator of the lines to write.
+
+        The lines can be shared with the service, so they are not modified.
+        """
+        lines = self._lines
+
+        if not lines or lines[-1].endswith(b"\n"):
+            return reversed(lines) if self._reverse else iter(lines)
 
         # Last line could be missing the trailing line ending if it came from GUI.
         # That breaks the reversed output, so make sure it is there.
-        if self._lines and not self._lines[-1].endswith("\n"):
-            self._lines[-1] += "\n"
+        last_line = (lines[-1] + b"\n",)
+
+        if self._reverse:
+            return chain(last_line, islice(reversed(lines), 1, None))
+
+        return chain(islice(lines, len(lines) - 1), last_line)
+
+    def _get_values(self):
+        """Get values of the variables of the template."""
+        values = get_builtin_variables(self._sysroot)
+        values.update(self._variables)
+        return values
+
+    def _render_template(self):
+        """Get an iterator of the rendered lines to write."""
+        return self._plan.render(self._get_values(), reverse=self._reverse)
+
+
+class HelloWorldDocumentsInstallationTask(Task):
+    """The HelloWorld installation task of multiple documents.
+
+    The documents are independent, so they are written in parallel.
+    """
+
+    # The maximal number of documents written at the same time.
+    MAX_WORKERS = 4
+
+    def __init__(self, sysroot, tasks):
+        """Create a new task.
+
+        :param sysroot: a path to the root of the installed system
+        :param tasks: a list of HelloWorldInstallationTask
+        """
+        super().__init__()
+        self._sysroot = sysroot
+        self._tasks = tasks
+
+    @property
+    def name(self):
+        return "Install HelloWorld documents"
+
+    def run(self):
+        """The run method performs the actual work.
+
+        The free space is checked for all documents at once. Every document
+        is written by its own task. The first failure is raised after all
+        tasks are finished.
+        """
+        log.info("Running installation task of %d documents.", len(self._tasks))
+        check_free_space(self._sysroot, {task.path: task.get_size() for task in self._tasks})
+
+        with ThreadPoolExecutor(self.MAX_WORKERS, "HelloWorldDocument") as executor:
+            futures = [executor.submit(task.write) for task in self._tasks]
+
+        for future in futures:
+            future.result()
+
+
+def get_document_path(name):
+    """Get the path of the file of the given document.
+
+    :param name: a name of the document or an empty string for the default one
+    :return: a path relative to the root of the installed system
+    """
+    if not name:
+        return HELLO_WORLD_FILE_PATH
+
+    return HELLO_WORLD_DOCUMENT_PATH.format(name=name)
+
+
+def check_free_space(sysroot, sizes):
+    """Check that there is enough space for the files.
+
+    The files can be on different file systems, so the space is checked
+    per file system.
+
+    :param sysroot: a path to the root of the installed system
+    :param sizes: a dictionary of paths of the files relative to the root
+                  and their maximal sizes in bytes
+    :raise: InstallationError if there is not enough space
+    """
+    file_systems = {}
+
+    for path, size in sizes.items():
+        file_path = normpath(joinpath(sysroot, path))
+        device, available = get_free_space(file_path)
+        paths, required, _available = file_systems.get(device, ([], 0, available))
+        file_systems[device] = (paths + [file_path], required + size, available)
+
+    for paths, required, available in file_systems.values():
+        log.debug("The files need %d bytes, %d bytes are available.", required, available)
+
+        if required > available:
+            raise InstallationError(
+                "Not enough space for {}: {} bytes are required, but only {} bytes "
+                "are available.".format(", ".join(paths), required, available)
+            )
+
+
+def get_free_space(path):
+    """Get the file system and the free space available for the given path.
+
+    The path doesn't have to exist yet. The nearest existing parent is used.
+
+    :param path: a path to a file
+    :return: a tuple of the device number of the file system and a number of bytes
+    """
+    path = os.path.dirname(os.path.abspath(path))
+
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
 
-        iterator = reversed(self._lines) if self._reverse else self._lines
-        with open(hello_file_path, "w") as hello_file:
-            for line in iterator:
-                hello_file.write(line)
+    stat = os.statvfs(path)
+    return os.stat(path).st_dev, stat.f_bavail * stat.f_frsize
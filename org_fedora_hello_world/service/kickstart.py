@@ -18,23 +18,175 @@
 
 """This module defines the parts needed for handling Kickstart data in the service."""
 
+import codecs
 import logging
+import re
+import shlex
+from functools import lru_cache
 
+from pykickstart.errors import KickstartParseError
 from pykickstart.options import KSOptionParser
 
 from pyanaconda.core.kickstart import VERSION, KickstartSpecification
 from pyanaconda.core.kickstart.addon import AddonData
 
+from org_fedora_hello_world.service.compression import COMPRESSION_METHODS, \
+    check_compression_level
+from org_fedora_hello_world.service.store import encode_lines
+from org_fedora_hello_world.service.template import RenderPlan, TemplateError
+from org_fedora_hello_world.service.validation import ValidationRules
+
 log = logging.getLogger(__name__)
 
+# Names of documents are used in paths of files.
+DOCUMENT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class HelloWorldDocumentData:  # pylint: disable=too-many-instance-attributes
+    """The kickstart data of one document of the Hello World addon.
+
+    Every document is written to its own file. The default document has
+    an empty name, other documents are defined with the --name option.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.lines = []
+        self.reverse = False
+        self.template = False
+        self.variables = {}
+        self.rules = ValidationRules()
+        self.compress = ""
+        self.compress_level = None
+        self._line_number = None
+
+    def handle_options(self, ns, line_number=None):
+        """Store the parsed arguments of the %addon line.
+
+        :param ns: a namespace with the parsed arguments
+        :param line_number: the current line number in the kickstart file
+        """
+        self.reverse = ns.reverse
+        self.template = ns.template
+        self.variables = {}
+        self._line_number = line_number
+
+        for variable in ns.variables:
+            name, separator, value = variable.partition("=")
+
+            if not separator or not name.isidentifier():
+                raise KickstartParseError(
+                    "Invalid variable definition: {}".format(variable),
+                    lineno=line_number
+                )
+
+            self.variables[name] = value
+
+        if ns.max_line_length < 0:
+            raise KickstartParseError(
+                "Invalid maximal line length: {}".format(ns.max_line_length),
+                lineno=line_number
+            )
+
+        if ns.encoding:
+            try:
+                codecs.lookup(ns.encoding)
+            except LookupError:
+                raise KickstartParseError(
+                    "Unknown encoding: {}".format(ns.encoding),
+                    lineno=line_number
+                ) from None
+
+        self.rules = ValidationRules(ns.max_line_length, ns.forbidden_chars, ns.encoding)
+        self.compress = ns.compress
+        self.compress_level = ns.compress_level
+
+        if ns.compress_level is not None and not ns.compress:
+            raise KickstartParseError(
+                "The --compress-level option requires the --compress option.",
+                lineno=line_number
+            )
+
+        if ns.compress:
+            try:
+                check_compression_level(ns.compress, ns.compress_level)
+            except ValueError as e:
+                raise KickstartParseError(str(e), lineno=line_number) from None
+
+    def handle_end(self):
+        """Check the template, so any errors are reported together with
+        other kickstart errors.
+
+        The template is compiled later from the stored lines.
+        """
+        if not self.template:
+            return
+
+        try:
+            RenderPlan.check(encode_lines(self.lines), self.variables)
+        except TemplateError as e:
+            raise KickstartParseError(str(e), lineno=self._line_number) from None
+
+    def __str__(self):
+        """The %addon section of the document."""
+        section = "\n%addon org_fedora_hello_world"
+
+        if self.name:
+            section += " --name=" + self.name
+
+        if self.reverse:
+            section += " --reverse"
+
+        if self.template:
+            section += " --template"
+
+        for name, value in self.variables.items():
+            section += " --var=" + shlex.quote("{}={}".format(name, value))
+
+        if self.rules.max_line_length:
+            section += " --max-line-length={}".format(self.rules.max_line_length)
+
+        if self.rules.forbidden_chars:
+            section += " --forbidden-chars=" + shlex.quote(self.rules.forbidden_chars)
+
+        if self.rules.encoding:
+            section += " --encoding=" + shlex.quote(self.rules.encoding)
+
+        if self.compress:
+            section += " --compress=" + self.compress
+
+        if self.compress_level is not None:
+            section += " --compress-level={}".format(self.compress_level)
+
+        section += "\n"
+
+        for line in self.lines:
+            section += line
+
+        if not section.endswith("\n"):
+            section += "\n"
+
+        section += "%end\n"
+        return section
+
 
 class HelloWorldData(AddonData):
-    """The kickstart data for the Hello World addon."""
+    """The kickstart data for the Hello World addon.
+
+    The data consist of documents. The default document is always present.
+    Every %addon section defines the document with the given name, and its
+    lines are appended to the document.
+    """
 
     def __init__(self):
         super().__init__()
-        self.lines = []
-        self.reverse = False
+        self.documents = {"": HelloWorldDocumentData()}
+        self._current = self.documents[""]
+
+    @property
+    def default(self):
+        """The default document."""
+        return self.documents[""]
 
     def handle_header(self, args, line_number=None):
         """The handle_header method is called to parse additional arguments
@@ -52,27 +204,24 @@ class HelloWorldData(AddonData):
         :param args: the list of arguments from the %addon line
         :type args: List[Str]
         """
-        # Create the argument parser.
-        op = KSOptionParser(
-            prog="%addon org_fedora_hello_world",
-            version=VERSION,
-            description="Configure the Hello World Addon."
-        )
-
-        op.add_argument(
-            "--reverse",
-            action="store_true",
-            default=False,
-            version=VERSION,
-            dest="reverse",
-            help="Reverse the display of the addon text."
-        )
+        # Get the argument parser.
+        op = _get_option_parser()
 
         # Parse the arguments.
         ns = op.parse_args(args=args, lineno=line_number)
 
+        if ns.name and not DOCUMENT_NAME_PATTERN.match(ns.name):
+            raise KickstartParseError(
+                "Invalid document name: {}".format(ns.name),
+                lineno=line_number
+            )
+
         # Store the result of the parsing.
-        self.reverse = ns.reverse
+        if ns.name not in self.documents:
+            self.documents[ns.name] = HelloWorldDocumentData(ns.name)
+
+        self._current = self.documents[ns.name]
+        self._current.handle_options(ns, line_number)
 
     def handle_line(self, line, line_number=None):  # pylint: disable=unused-argument
         """The handle_line method that is called with every line from this
@@ -93,28 +242,112 @@ class HelloWorldData(AddonData):
         :param line_number: number of the line
         :type line_number: int
         """
-        # simple example, we just append lines to the lines attribute
-        self.lines.append(line)
+        # simple example, we just append lines to the current document
+        self._current.lines.append(line)
+
+    def handle_end(self):
+        """The handle_end method that is called at the end of the %addon section."""
+        self._current.handle_end()
 
     def __str__(self):
         """What should end up in the resulting kickstart file, i.e. the %addon
-        section containing string representation of the stored data.
+        sections containing string representation of the stored data.
         """
-        section = "\n%addon org_fedora_hello_world"
+        return "".join(map(str, self.documents.values()))
 
-        if self.reverse:
-            section += " --reverse"
 
-        section += "\n"
+@lru_cache(maxsize=None)
+def _get_option_parser():
+    """Get the argument parser of the %addon line.
 
-        for line in self.lines:
-            section += line
+    The parser is created only once, because it is the same for every section.
+    """
+    op = KSOptionParser(
+        prog="%addon org_fedora_hello_world",
+        version=VERSION,
+        description="Configure the Hello World Addon."
+    )
 
-        if not section.endswith("\n"):
-            section += "\n"
+    op.add_argument(
+        "--name",
+        default="",
+        version=VERSION,
+        dest="name",
+        help="Define a document with the given name, which is written to its own file."
+    )
 
-        section += "%end\n"
-        return section
+    op.add_argument(
+        "--reverse",
+        action="store_true",
+        default=False,
+        version=VERSION,
+        dest="reverse",
+        help="Reverse the display of the addon text."
+    )
+
+    op.add_argument(
+        "--template",
+        action="store_true",
+        default=False,
+        version=VERSION,
+        dest="template",
+        help="Render references to variables in the addon text."
+    )
+
+    op.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        version=VERSION,
+        dest="variables",
+        metavar="NAME=VALUE",
+        help="Define a variable for the template."
+    )
+
+    op.add_argument(
+        "--max-line-length",
+        type=int,
+        default=0,
+        version=VERSION,
+        dest="max_line_length",
+        help="Report lines of the addon text longer than the given number of characters."
+    )
+
+    op.add_argument(
+        "--forbidden-chars",
+        default="",
+        version=VERSION,
+        dest="forbidden_chars",
+        help="Report lines of the addon text that contain any of the given characters."
+    )
+
+    op.add_argument(
+        "--encoding",
+        default="",
+        version=VERSION,
+        dest="encoding",
+        help="Report lines of the addon text that can't be encoded in the given encoding."
+    )
+
+    op.add_argument(
+        "--compress",
+        choices=sorted(COMPRESSION_METHODS),
+        default="",
+        version=VERSION,
+        dest="compress",
+        help="Compress the hello world file with the given method."
+    )
+
+    op.add_argument(
+        "--compress-level",
+        type=int,
+        default=None,
+        version=VERSION,
+        dest="compress_level",
+        help="Use the given compression level."
+    )
+
+    return op
 
 
 class HelloWorldKickstartSpecification(KickstartSpecification):
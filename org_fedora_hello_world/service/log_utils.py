@@ -0,0 +1,146 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module contains helpers for logging of the addon's content.
+
+The content can be arbitrarily large, so it should never end up in the log as a whole.
+Log a summary of the content instead:
+
+    log.debug("Lines is set to %s.", ContentSummary(lines))
+
+The summary is computed only when the log record is actually formatted, so it costs
+nothing if the given log level is disabled.
+"""
+
+import hashlib
+import logging
+import time
+
+__all__ = ["ContentSummary", "RateLimitFilter"]
+
+
+class ContentSummary:
+    """A lazy summary of lines for the log.
+
+    The summary contains the number of lines, the number of characters or
+    bytes and a short digest of the content. Optionally, it contains also
+    a truncated preview of the content.
+    """
+
+    def __init__(self, lines, preview=0, digest=True):
+        """Create a new summary.
+
+        :param lines: a sequence of strings or encoded strings
+        :param preview: a maximal number of characters to show or 0
+        :param digest: should the digest of the content be computed?
+        """
+        self._lines = lines
+        self._preview = preview
+        self._digest = digest
+
+    def _get_digest(self):
+        """Compute a short digest of the content."""
+        checksum = hashlib.blake2b(digest_size=8)
+
+        for line in self._lines:
+            checksum.update(_encode(line))
+
+        return checksum.hexdigest()
+
+    def _get_preview(self):
+        """Get the beginning of the content."""
+        text = ""
+
+        for line in self._lines:
+            text += _decode(line)
+
+            if len(text) > self._preview:
+                return text[:self._preview] + "..."
+
+        return text
+
+    def __str__(self):
+        unit = "bytes" if self._lines and isinstance(self._lines[0], bytes) else "characters"
+        parts = [
+            "{} lines".format(len(self._lines)),
+            "{} {}".format(sum(map(len, self._lines)), unit)
+        ]
+
+        if self._digest:
+            parts.append("digest {}".format(self._get_digest()))
+
+        if self._preview:
+            parts.append("preview {!r}".format(self._get_preview()))
+
+        return "<{}>".format(", ".join(parts))
+
+
+def _encode(line):
+    """Encode the line if it is a string."""
+    if isinstance(line, str):
+        return line.encode("utf-8", "surrogatepass")
+
+    return line
+
+
+def _decode(line):
+    """Decode the line if it is encoded."""
+    if isinstance(line, bytes):
+        return line.decode("utf-8", "replace")
+
+    return line
+
+
+class RateLimitFilter(logging.Filter):
+    """A log filter that limits the rate of repeated messages.
+
+    Records with the same message are logged at most once per the given
+    interval. The number of suppressed records is reported with the next
+    record that passes the filter.
+
+    The arguments of the records are not compared, so messages with
+    different values are suppressed as well. Add the filter only to
+    a dedicated logger of frequent messages, not to a module logger.
+    """
+
+    def __init__(self, interval=1.0):
+        """Create a new filter.
+
+        :param interval: a minimal number of seconds between two records
+        """
+        super().__init__()
+        self._interval = interval
+        self._last_time = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        last_time = self._last_time.get(key)
+
+        if last_time is not None and now - last_time < self._interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+
+        self._last_time[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+
+        if suppressed:
+            record.msg = "{} ({} similar messages suppressed)".format(record.msg, suppressed)
+
+        return True
@@ -0,0 +1,239 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements memory introspection and limits of the service.
+
+Allocations of the service are traced only if the tracing is enabled with the standard
+environment variable of Python, for example PYTHONTRACEMALLOC=1. The tracing slows the
+service down, so it is disabled by default.
+
+The content of the service is limited by a memory budget. The budget is shared by all
+documents of the service. The default budget can be changed with the
+HELLO_WORLD_MEMORY_BUDGET environment variable in bytes.
+"""
+
+import logging
+import os
+import resource
+import tracemalloc
+from array import array
+
+from dasbus.structure import DBusData
+from dasbus.typing import *  # pylint: disable=wildcard-import,unused-wildcard-import
+
+from org_fedora_hello_world.constants import HELLO_WORLD_MEMORY_BUDGET, \
+    HELLO_WORLD_MEMORY_BUDGET_VARIABLE
+
+log = logging.getLogger(__name__)
+
+__all__ = ["MemoryBudget", "MemoryReport", "get_memory_report", "get_memory_budget",
+           "get_content_size", "get_stored_size"]
+
+# The size of an index of a line to the table of the store.
+ID_SIZE = array("I").itemsize
+
+
+class MemoryReport(DBusData):  # pylint: disable=too-many-instance-attributes
+    """A report of the memory usage of the service."""
+
+    def __init__(self):
+        self._tracing = False
+        self._current = 0
+        self._peak = 0
+        self._max_rss = 0
+        self._budget = 0
+        self._usage = 0
+        self._top_allocations = []
+
+    @property
+    def tracing(self) -> Bool:
+        """Are the memory allocations traced?"""
+        return self._tracing
+
+    @tracing.setter
+    def tracing(self, value: Bool):
+        self._tracing = value
+
+    @property
+    def current(self) -> UInt64:
+        """The size of the traced memory blocks in bytes."""
+        return self._current
+
+    @current.setter
+    def current(self, value: UInt64):
+        self._current = value
+
+    @property
+    def peak(self) -> UInt64:
+        """The peak size of the traced memory blocks in bytes."""
+        return self._peak
+
+    @peak.setter
+    def peak(self, value: UInt64):
+        self._peak = value
+
+    @property
+    def max_rss(self) -> UInt64:
+        """The maximal resident set size of the service in bytes."""
+        return self._max_rss
+
+    @max_rss.setter
+    def max_rss(self, value: UInt64):
+        self._max_rss = value
+
+    @property
+    def budget(self) -> UInt64:
+        """The memory budget for the content in bytes."""
+        return self._budget
+
+    @budget.setter
+    def budget(self, value: UInt64):
+        self._budget = value
+
+    @property
+    def usage(self) -> UInt64:
+        """The memory used by the content of all documents in bytes."""
+        return self._usage
+
+    @usage.setter
+    def usage(self, value: UInt64):
+        self._usage = value
+
+    @property
+    def top_allocations(self) -> List[Str]:
+        """Source lines with the biggest traced allocations."""
+        return self._top_allocations
+
+    @top_allocations.setter
+    def top_allocations(self, value: List[Str]):
+        self._top_allocations = value
+
+
+class MemoryBudget:
+    """A memory budget shared by the documents of the service."""
+
+    def __init__(self, limit):
+        """Create a new memory budget.
+
+        :param limit: a number of bytes
+        """
+        self._limit = limit
+        self._usage = {}
+
+    @property
+    def limit(self):
+        """The memory budget in bytes."""
+        return self._limit
+
+    @property
+    def usage(self):
+        """The memory used by all documents in bytes."""
+        return sum(self._usage.values())
+
+    def get_available(self, name):
+        """Get the memory available to the document.
+
+        The memory used by the document itself is available, because
+        the document replaces its content.
+
+        :param name: a name of the document
+        :return: a number of bytes
+        """
+        used = self.usage - self._usage.get(name, 0)
+        return max(self._limit - used, 0)
+
+    def update(self, name, size):
+        """Update the memory used by the document.
+
+        :param name: a name of the document
+        :param size: a number of bytes
+        """
+        self._usage[name] = size
+
+    def release(self, name):
+        """Release the memory used by the document.
+
+        :param name: a name of the document
+        """
+        self._usage.pop(name, None)
+
+
+def get_memory_report(budget, limit):
+    """Get a report of the memory usage.
+
+    :param budget: an instance of MemoryBudget
+    :param limit: a maximal number of the top allocations
+    :return: an instance of MemoryReport
+    """
+    report = MemoryReport()
+    report.budget = budget.limit
+    report.usage = budget.usage
+
+    # The value is in kilobytes on Linux.
+    report.max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    if not tracemalloc.is_tracing():
+        return report
+
+    report.tracing = True
+    report.current, report.peak = tracemalloc.get_traced_memory()
+
+    if limit:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        statistics = snapshot.statistics("lineno")
+        report.top_allocations = [str(stat) for stat in statistics[:limit]]
+
+    return report
+
+
+def get_memory_budget():
+    """Get the memory budget for the content.
+
+    :return: a number of bytes
+    """
+    value = os.environ.get(HELLO_WORLD_MEMORY_BUDGET_VARIABLE)
+
+    if not value:
+        return HELLO_WORLD_MEMORY_BUDGET
+
+    try:
+        return int(value)
+    except ValueError:
+        log.warning("Invalid memory budget: %s", value)
+        return HELLO_WORLD_MEMORY_BUDGET
+
+
+def get_content_size(lines):
+    """Get the size of the memory needed for the lines.
+
+    :param lines: an instance of LinesView
+    :return: a number of bytes
+    """
+    return get_stored_size(lines.size, len(lines))
+
+
+def get_stored_size(size, count):
+    """Get the size of the memory needed for lines in the store.
+
+    :param size: a size of the encoded lines in bytes
+    :param count: a number of the lines
+    :return: a number of bytes
+    """
+    return size + count * ID_SIZE
@@ -0,0 +1,341 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+
+"""This module implements search of the lines.
+
+The lines are searched in the table of distinct lines, so every distinct line is
+checked only once regardless of how many times it is used. The table of the store is
+indexed by trigrams, which are all substrings of three bytes of the lines. Only lines
+that contain the least common trigram of the pattern are checked for the pattern.
+
+Tables of the store are never changed, they only grow. The index is created by the
+first search and it is updated with new lines of the table before every search. The
+lines are indexed in a background thread, so the search doesn't wait for the index.
+Lines that are not indexed yet are checked directly. If the store replaces its table
+with a compact one, the index keeps serving the old table until the new one is
+indexed.
+
+The index takes several times more memory than the lines, so large tables are not
+indexed at all. Their distinct lines are checked directly.
+
+Tables mapped from the checkpoint search their buffer instead, and other tables
+are checked line by line.
+
+The positions of the found distinct lines are searched in the array of indexes
+of the view with the fast search of bytes.
+"""
+
+import threading
+from array import array
+from itertools import islice
+
+__all__ = ["LineIndex", "LineSearch", "match_lines"]
+
+# The length of indexed substrings.
+TRIGRAM_SIZE = 3
+
+# The size of an index of a line to the table.
+ID_SIZE = array("I").itemsize
+
+
+class LineIndex:
+    """A trigram index of a table of distinct lines.
+
+    New lines of the table are indexed in a background thread.
+    """
+
+    # The number of lines indexed at once.
+    BATCH_SIZE = 4096
+
+    # The maximal size of indexed tables in bytes.
+    MAX_TABLE_SIZE = 4 * 1024 * 1024
+
+    # The estimated size of the index relative to the size of the indexed lines.
+    SIZE_RATIO = 8
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table = None
+        self._count = 0
+        self._trigrams = {}
+        self._pending = None
+        self._thread = None
+
+    @classmethod
+    def estimate_size(cls, size):
+        """Estimate the memory used by the index of a table.
+
+        :param size: a size of the lines of the table in bytes
+        :return: a number of bytes
+        """
+        if size > cls.MAX_TABLE_SIZE:
+            return 0
+
+        return size * cls.SIZE_RATIO
+
+    def update(self, table, size):
+        """Schedule indexing of new lines of the table.
+
+        If the table is replaced, lines of the new table are indexed from
+        the start and the index of the old table is used until then. If
+        the table is too large, the index is dropped.
+
+        :param table: a list of distinct encoded lines that only grows
+        :param size: a size of the lines of the table in bytes
+        """
+        if size > self.MAX_TABLE_SIZE:
+            self.stop()
+            return
+
+        with self._lock:
+            self._pending = table if table is not self._table else None
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="HelloWorldLineIndex", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Drop the index and stop the indexing.
+
+        The background thread finishes at most one batch of lines.
+        """
+        with self._lock:
+            self._table = None
+            self._count = 0
+            self._trigrams = {}
+            self._pending = None
+
+    def _run(self):
+        """Index new lines in batches until all lines are indexed."""
+        table, count, trigrams = None, 0, None
+
+        while True:
+            with self._lock:
+                if self._pending is not None:
+                    # Index a new table separately from the used index.
+                    if table is not self._pending:
+                        table, count, trigrams = self._pending, 0, {}
+
+                    if count >= len(table):
+                        self._table, self._count, self._trigrams = table, count, trigrams
+                        self._pending = None
+                        continue
+
+                    batch = trigrams
+                elif self._table is not None and self._count < len(self._table):
+                    table, count, trigrams = self._table, self._count, None
+                    batch = {}
+                else:
+                    self._thread = None
+                    return
+
+                end = min(len(table), count + self.BATCH_SIZE)
+
+            _index_lines(batch, table, count, end)
+
+            if batch is not trigrams:
+                self._merge(table, batch, end)
+
+            count = end
+
+    def _merge(self, table, batch, count):
+        """Merge a batch of new lines into the used index.
+
+        :param table: the indexed table
+        :param batch: a dictionary of trigrams and arrays of indexes to the table
+        :param count: a number of indexed lines of the table
+        """
+        with self._lock:
+            # The index was stopped in the meantime.
+            if table is not self._table:
+                return
+
+            for trigram, postings in batch.items():
+                indexed = self._trigrams.get(trigram)
+
+                if indexed is None:
+                    self._trigrams[trigram] = postings
+                else:
+                    indexed.extend(postings)
+
+            self._count = count
+
+    def match(self, table, pattern):
+        """Find distinct lines of the table that contain the pattern.
+
+        :param table: a table of distinct encoded lines
+        :param pattern: an encoded pattern
+        :return: a list of indexes to the table or None if the table is not indexed
+        """
+        with self._lock:
+            if table is not self._table:
+                return None
+
+            count = self._count
+
+            # Short patterns can't be looked up, so check all lines.
+            if len(pattern) < TRIGRAM_SIZE:
+                candidates = range(count)
+            else:
+                end = len(pattern) - TRIGRAM_SIZE + 1
+                candidates = min(
+                    (self._trigrams.get(pattern[i:i + TRIGRAM_SIZE], ()) for i in range(end)),
+                    key=len
+                )
+
+            line_ids = [line_id for line_id in candidates if pattern in table[line_id]]
+
+        # Check the lines that are not indexed yet.
+        line_ids.extend(
+            line_id for line_id in range(count, len(table)) if pattern in table[line_id]
+        )
+        return line_ids
+
+
+def _index_lines(trigrams, table, start, end):
+    """Add the given lines of the table to the trigram index.
+
+    :param trigrams: a dictionary of trigrams and arrays of indexes to the table
+    :param table: a table of distinct encoded lines
+    :param start: an index of the first line to index
+    :param end: an index after the last line to index
+    """
+    for line_id in range(start, end):
+        line = table[line_id]
+
+        end = len(line) - TRIGRAM_SIZE + 1
+
+        for trigram in {line[i:i + TRIGRAM_SIZE] for i in range(end)}:
+            postings = trigrams.get(trigram)
+
+            if postings is None:
+                postings = trigrams[trigram] = array("I")
+
+            postings.append(line_id)
+
+
+def match_lines(table, pattern, index=None):
+    """Find distinct lines of the table that contain the pattern.
+
+    The lines are looked up in the index if it serves the table. Tables
+    mapped from the checkpoint search their buffer. Other tables are
+    checked line by line.
+
+    :param table: a table of distinct encoded lines
+    :param pattern: an encoded pattern
+    :param index: an instance of LineIndex or None
+    :return: a list of indexes to the table
+    """
+    line_ids = index.match(table, pattern) if index is not None else None
+
+    if line_ids is not None:
+        return line_ids
+
+    if hasattr(table, "find"):
+        return table.find(pattern)
+
+    return [line_id for line_id in range(len(table)) if pattern in table[line_id]]
+
+
+class LineSearch:
+    """A search of lines of views."""
+
+    # Scan the whole view if more distinct lines are found.
+    MAX_LOCATED_LINES = 32
+
+    def __init__(self):
+        self._data = (None, b"")
+
+    def find(self, lines, pattern, index=None, limit=0):
+        """Find lines that contain the pattern.
+
+        :param lines: an instance of LinesView
+        :param pattern: an encoded pattern without line endings
+        :param index: an instance of LineIndex or None
+        :param limit: a maximal number of found lines or 0 for all
+        :return: a sorted list of indexes of the found lines
+        """
+        if not lines or b"\n" in pattern:
+            return []
+
+        line_ids = match_lines(lines.table, pattern, index)
+
+        if not line_ids:
+            return []
+
+        if len(line_ids) > self.MAX_LOCATED_LINES:
+            return self._scan(lines.ids, set(line_ids), limit)
+
+        return self._locate(lines.ids, line_ids, limit)
+
+    def _get_data(self, ids):
+        """Get the array of indexes as bytes.
+
+        The bytes are kept until the array is replaced.
+        """
+        cached_ids, data = self._data
+
+        if cached_ids is not ids:
+            data = memoryview(ids).cast("B").tobytes()
+            self._data = (ids, data)
+
+        return data
+
+    def _locate(self, ids, line_ids, limit):
+        """Find the positions of a few distinct lines in the view.
+
+        :param ids: an array of indexes to the table
+        :param line_ids: a list of indexes of the distinct lines
+        :param limit: a maximal number of positions or 0 for all
+        :return: a sorted list of positions
+        """
+        data = self._get_data(ids)
+        positions = []
+
+        for line_id in line_ids:
+            needle = array("I", [line_id]).tobytes()
+            found = 0
+            offset = data.find(needle)
+
+            while offset >= 0 and (not limit or found < limit):
+                # Skip matches that span two indexes.
+                if offset % ID_SIZE:
+                    offset = data.find(needle, offset + 1)
+                    continue
+
+                positions.append(offset // ID_SIZE)
+                found += 1
+                offset = data.find(needle, offset + ID_SIZE)
+
+        positions.sort()
+        return positions[:limit] if limit else positions
+
+    @staticmethod
+    def _scan(ids, line_ids, limit):
+        """Find the positions of many distinct lines in the view.
+
+        :param ids: an array of indexes to the table
+        :param line_ids: a set of indexes of the distinct lines
+        :param limit: a maximal number of positions or 0 for all
+        :return: a sorted list of positions
+        """
+        positions = (i for i, line_id in enumerate(ids) if line_id in line_ids)
+        return list(islice(positions, limit or None))
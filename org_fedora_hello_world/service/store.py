@@ -0,0 +1,210 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements storage of lines in the service.
+
+The content of the hello world file is usually very repetitive. The store keeps every
+distinct line only once in a table and represents a document as an array of indexes
+to the table. The lines are expanded only when they are read.
+
+The lines are stored as UTF-8 encoded bytes, so they can be written to the hello world
+file or to the checkpoint without encoding. They are decoded only for clients that
+ask for text.
+"""
+
+from array import array
+from collections.abc import Sequence
+
+__all__ = ["LineStore", "LinesView", "encode_lines", "decode_lines", "split_content"]
+
+ENCODING = "utf-8"
+ERRORS = "surrogatepass"
+
+
+def encode_lines(lines):
+    """Encode the given lines.
+
+    :param lines: an iterable of strings
+    :return: an iterator of bytes
+    """
+    return (line.encode(ENCODING, ERRORS) for line in lines)
+
+
+def decode_lines(lines):
+    """Decode the given lines.
+
+    :param lines: an iterable of bytes
+    :return: a list of strings
+    """
+    return [str(line, ENCODING, ERRORS) for line in lines]
+
+
+def split_content(content):
+    """Split the encoded content into lines with their line endings.
+
+    :param content: a bytes-like object
+    :return: a list of bytes
+    """
+    return bytes(content).splitlines(keepends=True)
+
+
+class LinesView(Sequence):
+    """An immutable sequence of lines from the store.
+
+    The view shares the table of distinct lines with the store and other views.
+    That is safe, because lines in the table are never changed or removed.
+    """
+
+    __slots__ = ("_table", "_ids", "_size")
+
+    def __init__(self, table=(), ids=None, size=None):
+        """Create a new view.
+
+        :param table: a sequence of distinct encoded lines
+        :param ids: an array or a memoryview of indexes to the table
+        :param size: a size of the lines in bytes or None if unknown
+        """
+        self._table = table
+        self._ids = array("I") if ids is None else ids
+        self._size = size
+
+    @property
+    def table(self):
+        """A table of distinct lines."""
+        return self._table
+
+    @property
+    def ids(self):
+        """An array of indexes to the table of lines."""
+        return self._ids
+
+    @property
+    def size(self):
+        """A size of the lines in bytes.
+
+        The size is known for views created by the store. Otherwise, it is
+        computed when it is requested for the first time.
+        """
+        if self._size is None:
+            self._size = sum(map(len, self))
+
+        return self._size
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LinesView(self._table, self._ids[index])
+
+        return self._table[self._ids[index]]
+
+    def __iter__(self):
+        return map(self._table.__getitem__, self._ids)
+
+    def __reversed__(self):
+        return map(self._table.__getitem__, reversed(self._ids))
+
+    def to_bytes(self):
+        """Join the lines into one bytes object."""
+        return b"".join(self)
+
+    def __repr__(self):
+        return "LinesView({} lines)".format(len(self))
+
+
+class LineStore:
+    """A store of distinct lines.
+
+    Every distinct line is stored only once. The table of lines is extended
+    as new lines come, and it is replaced by a compact copy if most of its
+    lines are no longer used.
+
+    Sizes of new views and of the table are counted while the lines are stored.
+    """
+
+    # Compact the table if it is this many times bigger than the used part.
+    COMPACTION_RATIO = 4
+
+    # Don't bother with compaction of small tables.
+    COMPACTION_MINIMUM = 4096
+
+    def __init__(self):
+        self._table = []
+        self._index = {}
+        self._table_size = 0
+
+    @property
+    def size(self):
+        """The number of distinct lines in the table."""
+        return len(self._table)
+
+    @property
+    def table(self):
+        """The current table of distinct lines."""
+        return self._table
+
+    @property
+    def table_size(self):
+        """The size of the distinct lines of the table in bytes."""
+        return self._table_size
+
+    def create_view(self, lines):
+        """Store the given lines and return a view of them.
+
+        :param lines: an iterable of encoded lines
+        :return: an instance of LinesView
+        """
+        table = self._table
+        index = self._index
+        ids = array("I")
+        size = 0
+
+        for line in lines:
+            line_id = index.get(line)
+
+            if line_id is None:
+                line_id = index[line] = len(table)
+                table.append(line)
+                self._table_size += len(line)
+
+            ids.append(line_id)
+            size += len(line)
+
+        view = LinesView(table, ids, size)
+
+        if len(table) > self.COMPACTION_MINIMUM:
+            used = len(set(ids))
+
+            if len(table) > used * self.COMPACTION_RATIO:
+                view = self._compact(view)
+
+        return view
+
+    def _compact(self, view):
+        """Replace the table with a new one that contains only the given lines.
+
+        The old table is not modified, so existing views stay valid.
+
+        :param view: a view of the lines to keep
+        :return: a new view of the lines
+        """
+        self._table = []
+        self._index = {}
+        self._table_size = 0
+        return self.create_view(view)
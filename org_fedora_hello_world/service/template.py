@@ -0,0 +1,317 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements templates for lines of the hello world file.
+
+Lines of a template can refer to variables as ``${name}``. Use ``$$`` for a literal dollar
+sign. The following variables are always available:
+
+  * hostname - the hostname of the installed system
+  * sysroot - the path to the root of the installed system
+  * timestamp - the time of the rendering in the ISO 8601 format
+
+Other variables can be defined in the kickstart file.
+
+The template is compiled only once into a render plan. The plan keeps encoded lines
+without variables as they are and turns the other lines into format strings, so the
+rendering doesn't need to parse the lines again. Only the format strings are encoded
+again when they are rendered.
+"""
+
+import re
+import socket
+import sys
+import time
+from collections import Counter
+from os.path import join as joinpath
+
+from org_fedora_hello_world.service.store import ENCODING, ERRORS
+
+__all__ = ["BUILTIN_VARIABLES", "TemplateError", "RenderPlan", "get_builtin_variables"]
+
+BUILTIN_VARIABLES = ("hostname", "sysroot", "timestamp")
+
+# Maximal sizes of values of built-in variables that are not known in advance.
+BUILTIN_VARIABLE_SIZES = {
+    "hostname": 64,
+    "timestamp": 24,
+}
+
+VARIABLE_PATTERN = re.compile(r"\$(?:\{(?P<name>[A-Za-z_][A-Za-z0-9_]*)\}|(?P<escape>\$))")
+
+
+class TemplateError(ValueError):
+    """The template is not valid."""
+    pass
+
+
+class RenderPlan:
+    """A compiled template of lines."""
+
+    def __init__(self, steps, references):
+        """Create a new render plan.
+
+        Use the compile method instead.
+
+        :param steps: a sequence of encoded literal lines and compiled lines
+        :param references: a dictionary of numbers of references to variables
+        """
+        self._steps = tuple(steps)
+        self._references = dict(references)
+
+        # Literal lines are shared with the store, so only the compiled lines
+        # and the references to the literal lines take memory.
+        self._size = sys.getsizeof(self._steps) + sum(
+            sys.getsizeof(step) for step in self._steps if isinstance(step, _TemplateLine)
+        )
+
+    @classmethod
+    def compile(cls, lines, defined=()):
+        """Compile the given lines into a render plan.
+
+        :param lines: a sequence of encoded lines
+        :param defined: names of variables defined in addition to the built-in ones
+        :return: an instance of RenderPlan
+        :raise: TemplateError if an undefined variable is used
+        """
+        steps = []
+        references = Counter()
+
+        for line in lines:
+            # Most of the lines are usually plain text.
+            if b"$" not in line:
+                steps.append(line)
+                continue
+
+            steps.append(cls._compile_line(line, references))
+
+        # The last line could be missing the trailing line ending.
+        # That would break the reversed output, so make sure it is there.
+        if steps:
+            last_step = steps[-1]
+
+            if isinstance(last_step, _TemplateLine) and not last_step.endswith("\n"):
+                steps[-1] = _TemplateLine(last_step + "\n")
+            elif isinstance(last_step, bytes) and not last_step.endswith(b"\n"):
+                steps[-1] = last_step + b"\n"
+
+        cls._check_references(references, defined)
+        return cls(steps, references)
+
+    @classmethod
+    def check(cls, lines, defined=()):
+        """Check the given lines without keeping a render plan.
+
+        :param lines: an iterable of encoded lines
+        :param defined: names of variables defined in addition to the built-in ones
+        :raise: TemplateError if an undefined variable is used
+        """
+        references = Counter()
+
+        for line in lines:
+            if b"$" in line:
+                cls._compile_line(line, references)
+
+        cls._check_references(references, defined)
+
+    @staticmethod
+    def _check_references(references, defined):
+        """Check that all referenced variables are defined.
+
+        :param references: a counter of the referenced variables
+        :param defined: names of variables defined in addition to the built-in ones
+        :raise: TemplateError if an undefined variable is used
+        """
+        undefined = set(references).difference(BUILTIN_VARIABLES, defined)
+
+        if undefined:
+            raise TemplateError("Undefined template variables: {}".format(
+                ", ".join(sorted(undefined))
+            ))
+
+    @classmethod
+    def deferred(cls, lines, defined=()):
+        """Create a render plan that is compiled when it is used for the first time.
+
+        Use it only for lines that were already validated, because errors are
+        not reported until the plan is used.
+
+        :param lines: a sequence of encoded lines
+        :param defined: names of variables defined in addition to the built-in ones
+        :return: an instance of RenderPlan
+        """
+        return _DeferredRenderPlan(lines, defined)
+
+    @staticmethod
+    def _compile_line(line, references):
+        """Compile one line into a format string.
+
+        :param line: an encoded line with references to variables
+        :param references: a counter to update with the referenced variables
+        :return: a compiled line or the original line
+        """
+        encoded_line = line
+        line = str(encoded_line, ENCODING, ERRORS)
+
+        if not VARIABLE_PATTERN.search(line):
+            return encoded_line
+
+        parts = []
+        position = 0
+
+        for match in VARIABLE_PATTERN.finditer(line):
+            parts.append(_escape_braces(line[position:match.start()]))
+            position = match.end()
+
+            if match.group("escape"):
+                parts.append("$")
+                continue
+
+            name = match.group("name")
+            references[name] += 1
+            parts.append("{" + name + "}")
+
+        parts.append(_escape_braces(line[position:]))
+        return _TemplateLine("".join(parts))
+
+    @property
+    def variables(self):
+        """Names of the variables used in the template."""
+        return frozenset(self._references)
+
+    @property
+    def references(self):
+        """Numbers of references to the variables used in the template."""
+        return dict(self._references)
+
+    @property
+    def size(self):
+        """An estimate of the memory used by the plan in bytes."""
+        return self._size
+
+    def __len__(self):
+        return len(self._steps)
+
+    def estimate_growth(self, values):
+        """Estimate how many bytes the rendering adds to the template.
+
+        The estimate is an upper bound. Unknown values of built-in variables
+        are expected to have their maximal size.
+
+        :param values: a dictionary of known values of variables
+        :return: a number of bytes
+        """
+        growth = 0
+
+        for name, count in self._references.items():
+            if name in values:
+                size = len(values[name].encode(ENCODING, ERRORS))
+            else:
+                size = BUILTIN_VARIABLE_SIZES.get(name, 0)
+
+            growth += count * size
+
+        return growth
+
+    def render(self, values, reverse=False):
+        """Render the template.
+
+        :param values: a dictionary of values of the variables
+        :param reverse: should the lines be rendered in the reversed order?
+        :return: an iterator of the rendered encoded lines
+        """
+        steps = reversed(self._steps) if reverse else self._steps
+
+        for step in steps:
+            if type(step) is _TemplateLine:  # pylint: disable=unidiomatic-typecheck
+                yield step.format_map(values).encode(ENCODING, ERRORS)
+            else:
+                yield step
+
+
+class _DeferredRenderPlan(RenderPlan):
+    """A render plan that is compiled on demand."""
+
+    def __init__(self, lines, defined):  # pylint: disable=super-init-not-called
+        self._lines = lines
+        self._defined = tuple(defined)
+        self._plan = None
+
+    def _get_plan(self):
+        """Get the compiled plan."""
+        if self._plan is None:
+            self._plan = RenderPlan.compile(self._lines, self._defined)
+            self._lines = None
+
+        return self._plan
+
+    @property
+    def variables(self):
+        return self._get_plan().variables
+
+    @property
+    def references(self):
+        return self._get_plan().references
+
+    @property
+    def size(self):
+        # The plan takes no memory until it is compiled.
+        return self._plan.size if self._plan is not None else 0
+
+    def __len__(self):
+        return len(self._get_plan())
+
+    def estimate_growth(self, values):
+        return self._get_plan().estimate_growth(values)
+
+    def render(self, values, reverse=False):
+        return self._get_plan().render(values, reverse=reverse)
+
+
+class _TemplateLine(str):
+    """A compiled line with references to variables."""
+    __slots__ = ()
+
+
+def _escape_braces(text):
+    """Escape braces of a literal text in a format string."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def get_builtin_variables(sysroot):
+    """Get values of the built-in variables.
+
+    :param sysroot: a path to the root of the installed system
+    :return: a dictionary of values
+    """
+    return {
+        "hostname": _get_hostname(sysroot),
+        "sysroot": sysroot,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def _get_hostname(sysroot):
+    """Get the hostname of the installed system."""
+    try:
+        with open(joinpath(sysroot, "etc/hostname")) as hostname_file:
+            hostname = hostname_file.read().strip()
+    except OSError:
+        hostname = ""
+
+    return hostname or socket.gethostname()
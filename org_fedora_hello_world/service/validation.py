@@ -0,0 +1,263 @@
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""This module implements validation of lines of the hello world file.
+
+The rules are defined in the kickstart file. A line is valid if it is not longer than
+the maximal length, if it doesn't contain any of the forbidden characters and if it can
+be encoded in the required encoding.
+
+The lines are stored only once in the table of the store, so every distinct line is
+validated only once and the result is cached. Validation of new content checks only
+the lines that haven't been seen before.
+
+The validator remembers the positions of invalid lines of the last validated content.
+New content of the same table is compared with it, and only the changed range of
+lines is checked again. The rest of the positions is reused.
+"""
+
+import codecs
+from array import array
+from bisect import bisect_left
+
+from pyanaconda.modules.common.structures.validation import ValidationReport
+
+from org_fedora_hello_world.service.store import ENCODING, ERRORS
+
+__all__ = ["ValidationRules", "LineValidator"]
+
+# The maximal number of reported errors.
+MAX_MESSAGES = 100
+
+# The number of cached results that are kept in addition to the current table.
+CACHE_RESERVE = 4096
+
+# The number of indexes compared at once when the content is compared.
+CHUNK_SIZE = 1024
+
+
+class ValidationRules:
+    """Rules for lines of the hello world file."""
+
+    def __init__(self, max_line_length=0, forbidden_chars="", encoding=""):
+        """Create new rules.
+
+        :param max_line_length: a maximal number of characters in a line or 0
+        :param forbidden_chars: a string of characters not allowed in lines
+        :param encoding: a name of the required encoding or an empty string
+        """
+        self.max_line_length = max_line_length
+        self.forbidden_chars = forbidden_chars
+        self.encoding = encoding
+
+    @classmethod
+    def from_dict(cls, values):
+        """Create rules from a dictionary."""
+        return cls(**values)
+
+    def to_dict(self):
+        """Get a dictionary with the rules."""
+        return {
+            "max_line_length": self.max_line_length,
+            "forbidden_chars": self.forbidden_chars,
+            "encoding": self.encoding,
+        }
+
+    def __bool__(self):
+        return bool(self.max_line_length or self.forbidden_chars or self.encoding)
+
+    def __eq__(self, other):
+        return isinstance(other, ValidationRules) and self.to_dict() == other.to_dict()
+
+
+class LineValidator:
+    """A validator of lines with cached results."""
+
+    def __init__(self, rules):
+        """Create a new validator.
+
+        :param rules: an instance of ValidationRules
+        """
+        self._rules = rules
+        self._results = {}
+        self._last = (None, None, array("I"))
+        self._forbidden_chars = frozenset(rules.forbidden_chars)
+
+        if rules.encoding:
+            codecs.lookup(rules.encoding)
+
+    @property
+    def rules(self):
+        """The validation rules."""
+        return self._rules
+
+    def validate(self, lines):
+        """Validate the given lines.
+
+        :param lines: an instance of LinesView
+        :return: an instance of ValidationReport
+        """
+        report = ValidationReport()
+
+        if not self._rules:
+            return report
+
+        table, ids = lines.table, lines.ids
+        positions = self._find_invalid_lines(table, ids)
+        self._last = (table, ids, positions)
+
+        for position in positions[:MAX_MESSAGES]:
+            report.error_messages.append(
+                "Line {}: {}".format(position + 1, self._check_line(table[ids[position]]))
+            )
+
+        if len(positions) > MAX_MESSAGES:
+            report.error_messages.append(
+                "{} more lines are not valid.".format(len(positions) - MAX_MESSAGES)
+            )
+
+        return report
+
+    def _find_invalid_lines(self, table, ids):
+        """Find positions of invalid lines.
+
+        :param table: a table of distinct encoded lines
+        :param ids: an array or a memoryview of indexes to the table
+        :return: a sorted array of positions
+        """
+        last_table, last_ids, last_positions = self._last
+
+        # Drop results of lines from old tables.
+        if len(self._results) > 2 * len(table) + CACHE_RESERVE:
+            self._results = {}
+
+        if table is not last_table:
+            return self._check_range(table, ids, 0, len(ids))
+
+        # Check only the lines between the common prefix and suffix.
+        start = _get_common_length(last_ids, ids)
+        suffix = _get_common_length(
+            memoryview(last_ids)[start:], memoryview(ids)[start:], reverse=True
+        )
+        end, last_end = len(ids) - suffix, len(last_ids) - suffix
+        shift = end - last_end
+
+        positions = last_positions[:bisect_left(last_positions, start)]
+        positions.extend(self._check_range(table, ids, start, end))
+        positions.extend(
+            position + shift
+            for position in last_positions[bisect_left(last_positions, last_end):]
+        )
+        return positions
+
+    def _check_range(self, table, ids, start, end):
+        """Find positions of invalid lines in the given range.
+
+        Every distinct line is checked only once.
+
+        :param table: a table of distinct encoded lines
+        :param ids: an array or a memoryview of indexes to the table
+        :param start: a position of the first checked line
+        :param end: a position after the last checked line
+        :return: a sorted array of positions
+        """
+        part = memoryview(ids)[start:end]
+        invalid = {line_id for line_id in set(part) if self._check_line(table[line_id])}
+
+        if not invalid:
+            return array("I")
+
+        return array("I", (
+            position for position, line_id in enumerate(part, start) if line_id in invalid
+        ))
+
+    def _check_line(self, line):
+        """Check the encoded line.
+
+        :param line: an encoded line
+        :return: an error message or None
+        """
+        if line not in self._results:
+            self._results[line] = self._get_error(line)
+
+        return self._results[line]
+
+    def _get_error(self, line):
+        """Get an error of the encoded line.
+
+        :param line: an encoded line
+        :return: an error message or None
+        """
+        rules = self._rules
+        text = str(line, ENCODING, ERRORS).rstrip("\r\n")
+
+        if rules.max_line_length and len(text) > rules.max_line_length:
+            return "The line is longer than {} characters.".format(rules.max_line_length)
+
+        forbidden = self._forbidden_chars.intersection(text)
+
+        if forbidden:
+            return "The line contains forbidden characters: {}.".format(
+                ", ".join(repr(c) for c in sorted(forbidden))
+            )
+
+        if rules.encoding:
+            try:
+                text.encode(rules.encoding)
+            except UnicodeError:
+                return "The line can't be encoded in {}.".format(rules.encoding)
+
+        return None
+
+
+def _get_common_length(first, second, reverse=False):
+    """Get the length of the common prefix or suffix of two arrays of indexes.
+
+    The arrays are compared in chunks, so equal parts are compared quickly.
+
+    :param first: an array or a memoryview of indexes
+    :param second: an array or a memoryview of indexes
+    :param reverse: compare the suffixes instead of the prefixes
+    :return: a number of equal indexes
+    """
+    first, second = memoryview(first), memoryview(second)
+    size = min(len(first), len(second))
+    length = 0
+
+    while length < size:
+        step = min(CHUNK_SIZE, size - length)
+
+        if reverse:
+            first_chunk = first[len(first) - length - step:len(first) - length]
+            second_chunk = second[len(second) - length - step:len(second) - length]
+        else:
+            first_chunk = first[length:length + step]
+            second_chunk = second[length:length + step]
+
+        if bytes(first_chunk) == bytes(second_chunk):
+            length += step
+            continue
+
+        if reverse:
+            pairs = zip(reversed(first_chunk), reversed(second_chunk))
+        else:
+            pairs = zip(first_chunk, second_chunk)
+
+        return length + next(i for i, (a, b) in enumerate(pairs) if a != b)
+
+    return length
@@ -36,6 +36,7 @@ from simpleline.render.containers import ListColumnContainer
 from simpleline.render.widgets import CheckboxWidget, EntryWidget
 
 from pyanaconda.core.constants import PASSWORD_POLICY_ROOT
+from pyanaconda.modules.common.structures.validation import ValidationReport
 from pyanaconda.ui.tui.spokes import NormalTUISpoke
 from pyanaconda.ui.common import FirstbootSpokeMixIn
 # Simpleline's dialog configured for use in Anaconda
@@ -59,6 +60,7 @@ N_ = lambda x: x
 
 
 class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
+    # pylint: disable=too-many-instance-attributes
     """
     Class for the Hello world TUI spoke that is a subclass of NormalTUISpoke. It
     is a simple example of the basic unit for Anaconda's text user interface.
@@ -88,6 +90,15 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
         self._reverse = False
         self._lines = ""
 
+        # values changed by the user since the last setup
+        self._original_lines = ""
+        self._reverse_changed = False
+        self._lines_changed = False
+
+        # the lines of the D-Bus module or None if they have to be fetched again
+        self._module_lines = None
+        self._hello_world_module.PropertiesChanged.connect(self._on_properties_changed)
+
     def initialize(self):
         """
         The initialize method that is called after the instance is created.
@@ -108,7 +119,10 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
         super().setup(args)
 
         self._reverse = self._hello_world_module.Reverse
-        self._lines = self._hello_world_module.Lines
+        self._lines = self._get_module_lines()
+        self._original_lines = self._lines
+        self._reverse_changed = False
+        self._lines_changed = False
 
         return True
 
@@ -151,9 +165,17 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
         The apply method is not called automatically for TUI. It should be called
         in input() if required. It should update the contents of internal data
         structures with values set in the spoke.
+
+        Only the values changed by the user are sent to the D-Bus service.
         """
-        self._hello_world_module.SetReverse(self._reverse)
-        self._hello_world_module.SetLines(self._lines)
+        if self._reverse_changed:
+            self._hello_world_module.SetReverse(self._reverse)
+            self._reverse_changed = False
+
+        if self._lines_changed:
+            self._hello_world_module.SetLines(self._lines)
+            self._original_lines = self._lines
+            self._lines_changed = False
 
     def execute(self):
         """
@@ -173,7 +195,7 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
 
         :rtype: bool
         """
-        return bool(self._hello_world_module.Lines)
+        return bool(self._hello_world_module.OutputSize["lines"])
 
     @property
     def status(self):
@@ -185,17 +207,38 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
 
         :rtype: str
         """
-        lines = self._hello_world_module.Lines
+        lines = self._hello_world_module.OutputSize["lines"]
 
         if not lines:
             return _("No text set")
 
+        report = ValidationReport.from_structure(self._hello_world_module.ValidationReport)
+
+        if not report.is_valid():
+            return _("Text is not valid: {}").format(report.error_messages[0])
+
         reverse = self._hello_world_module.Reverse
 
         if reverse:
-            return _("Text set with {} lines to reverse").format(len(lines))
+            return _("Text set with {} lines to reverse").format(lines)
         else:
-            return _("Text set with {} lines").format(len(lines))
+            return _("Text set with {} lines").format(lines)
+
+    def _get_module_lines(self):
+        """Get the lines of the D-Bus module.
+
+        The lines are fetched only if they changed since the last time.
+        """
+        if self._module_lines is None:
+            self._module_lines = self._hello_world_module.Lines
+
+        return self._module_lines
+
+    def _on_properties_changed(self, interface, changed, invalidated):
+        # pylint: disable=unused-argument
+        """Forget the lines if the lines of the D-Bus module changed."""
+        if "Lines" in changed or "Lines" in invalidated:
+            self._module_lines = None
 
     def input(self, args, key):
         """
@@ -230,6 +273,7 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
         :type data: anything
         """
         self._reverse = not self._reverse
+        self._reverse_changed = not self._reverse_changed
 
     def _change_lines(self, data):   # pylint: disable=unused-argument
         """Callback when user wants to input new lines.
@@ -240,6 +284,7 @@ class HelloWorldSpoke(FirstbootSpokeMixIn, NormalTUISpoke):
         dialog = Dialog("Lines")
         result = dialog.run()
         self._lines = result.splitlines(True)
+        self._lines_changed = self._lines != self._original_lines
 
 
 class HelloWorldEditSpoke(NormalTUISpoke):
@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""Measure the HelloWorld D-Bus service under load of concurrent clients.
+
+The script starts a private D-Bus session bus with dbus-daemon, runs the service on it
+and starts the given number of client processes. Every client has its own connection
+to the bus and calls a random mix of reading the Lines property, SetLines and SetReverse
+for the given time. The script prints latency percentiles of every operation and the
+total throughput.
+
+Anaconda and dasbus have to be installed, for example in the container used by
+"make container-test".
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIR)
+
+# pylint: disable=wrong-import-position
+from dasbus.connection import AddressedMessageBus
+from pyanaconda.core.constants import DBUS_ANACONDA_SESSION_ADDRESS
+
+from org_fedora_hello_world.constants import HELLO_WORLD, HELLO_WORLD_CHECKPOINT_PATH_VARIABLE
+
+OPERATIONS = ("Lines", "SetLines", "SetReverse")
+
+
+def start_bus():
+    """Start a private session bus.
+
+    :return: a tuple of the process and the address of the bus
+    """
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE,
+        universal_newlines=True
+    )
+    address = process.stdout.readline().strip()
+
+    if not address:
+        process.kill()
+        raise RuntimeError("Failed to start dbus-daemon.")
+
+    return process, address
+
+
+def start_service(address, checkpoint_path):
+    """Start the HelloWorld service on the given bus.
+
+    The service uses its own checkpoint, so the load doesn't end up
+    in the checkpoint restored by the next start of the real service.
+
+    :param address: an address of the bus
+    :param checkpoint_path: a path to the checkpoint of the service
+    :return: the process of the service
+    """
+    environment = dict(os.environ)
+    environment[DBUS_ANACONDA_SESSION_ADDRESS] = address
+    environment[HELLO_WORLD_CHECKPOINT_PATH_VARIABLE] = checkpoint_path
+    environment["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [REPOSITORY_DIR, environment.get("PYTHONPATH")])
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "org_fedora_hello_world.service"],
+        env=environment
+    )
+
+
+def get_proxy(address):
+    """Get a proxy of the service on the given bus."""
+    bus = AddressedMessageBus(address)
+    return bus.get_proxy(HELLO_WORLD.service_name, HELLO_WORLD.object_path)
+
+
+def wait_for_service(address, timeout):
+    """Wait until the service responds."""
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            get_proxy(address).Reverse  # pylint: disable=expression-not-assigned
+            return
+        except Exception:  # pylint: disable=broad-except
+            if time.monotonic() > deadline:
+                raise
+
+            time.sleep(0.1)
+
+
+def create_payload(lines, width):
+    """Create lines for SetLines."""
+    return ["{:0{}d}\n".format(i, width - 1) for i in range(lines)]
+
+
+def run_client(args):
+    """Run one client.
+
+    :param args: a tuple of the bus address, the duration, the payload and the weights
+    :return: a dictionary of lists of latencies of the operations
+    """
+    address, duration, payload, weights, seed = args
+    proxy = get_proxy(address)
+    generator = random.Random(seed)
+    latencies = {name: [] for name in OPERATIONS}
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        operation = generator.choices(OPERATIONS, weights)[0]
+        start = time.perf_counter()
+
+        if operation == "Lines":
+            proxy.Lines  # pylint: disable=pointless-statement
+        elif operation == "SetLines":
+            proxy.SetLines(payload)
+        else:
+            proxy.SetReverse(generator.random() < 0.5)
+
+        latencies[operation].append(time.perf_counter() - start)
+
+    return latencies
+
+
+def print_report(latencies, elapsed):
+    """Print latency percentiles and throughput."""
+    row = "{:<12} {:>8} {:>10} {:>10} {:>10} {:>10}"
+    print(row.format("OPERATION", "CALLS", "P50", "P90", "P99", "MAX"))
+    total = 0
+
+    for name in OPERATIONS:
+        values = sorted(latencies[name])
+        total += len(values)
+
+        if not values:
+            print(row.format(name, 0, "-", "-", "-", "-"))
+            continue
+
+        # Quantiles need at least two values.
+        if len(values) < 2:
+            quantiles = values * 99
+        else:
+            quantiles = statistics.quantiles(values, n=100, method="inclusive")
+
+        print(row.format(
+            name,
+            len(values),
+            *("{:.2f} ms".format(value * 1000) for value in (
+                quantiles[49], quantiles[89], quantiles[98], values[-1]
+            ))
+        ))
+
+    print("{} calls in {:.1f} s, {:.1f} calls/s".format(total, elapsed, total / elapsed))
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Load test of the HelloWorld D-Bus service.")
+    parser.add_argument(
+        "-c", "--clients", type=int, default=4,
+        help="a number of concurrent clients (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-d", "--duration", type=float, default=10,
+        help="a duration of the test in seconds (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--lines", type=int, default=1000,
+        help="a number of lines sent by SetLines (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--width", type=int, default=80,
+        help="a length of the lines sent by SetLines (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--mix", type=float, nargs=3, default=[6, 3, 1], metavar=("LINES", "SET", "REVERSE"),
+        help="relative weights of Lines, SetLines and SetReverse (default: 6 3 1)"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30,
+        help="seconds to wait for the service to start (default: %(default)s)"
+    )
+    return parser.parse_args(argv)
+
+
+def run_clients(address, args):
+    """Run the clients and collect their results.
+
+    :param address: an address of the bus
+    :param args: the parsed command line arguments
+    :return: a tuple of a dictionary of lists of latencies and the elapsed time
+    """
+    payload = create_payload(args.lines, max(args.width, 2))
+    jobs = [
+        (address, args.duration, payload, args.mix, seed)
+        for seed in range(args.clients)
+    ]
+
+    start = time.monotonic()
+
+    with Pool(args.clients) as pool:
+        results = pool.map(run_client, jobs)
+
+    elapsed = time.monotonic() - start
+    latencies = {name: [] for name in OPERATIONS}
+
+    for result in results:
+        for name, values in result.items():
+            latencies[name].extend(values)
+
+    return latencies, elapsed
+
+
+def main(argv=None):
+    """Run the load test."""
+    args = parse_args(argv)
+    bus_process, address = start_bus()
+    service_process = None
+
+    with tempfile.TemporaryDirectory(prefix="hello_world_loadtest.") as directory:
+        try:
+            service_process = start_service(address, os.path.join(directory, "checkpoint"))
+            wait_for_service(address, args.timeout)
+            latencies, elapsed = run_clients(address, args)
+        finally:
+            for process in (service_process, bus_process):
+                if process:
+                    process.terminate()
+                    process.wait()
+
+    print("{} clients, {} lines of {} characters".format(args.clients, args.lines, args.width))
+    print_report(latencies, elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/python3
+#
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""Build an updates image with the addon.
+
+The image is a gzip-compressed cpio archive in the "newc" format with the same layout
+as Anaconda expects in the installation environment:
+
+    usr/share/anaconda/addons/org_fedora_hello_world/
+    usr/share/anaconda/dbus/services/
+    usr/share/anaconda/dbus/confs/
+
+Python modules are shipped together with their bytecode compiled by the target Python,
+so Anaconda doesn't have to compile them at the first import. The compiled files are
+cached by hashes of the sources, and the image is not rebuilt at all if nothing has
+changed since the last build.
+
+The archive is compressed in blocks in parallel. Every block is a complete gzip member
+and the members are concatenated, which is a valid gzip file.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADDON_NAME = "org_fedora_hello_world"
+ADDONS_DIR = "usr/share/anaconda/addons"
+SERVICES_DIR = "usr/share/anaconda/dbus/services"
+CONFS_DIR = "usr/share/anaconda/dbus/confs"
+
+DEFAULT_OUTPUT = "hello_world_addon_updates.img"
+DEFAULT_CACHE_DIR = ".updates-cache"
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# This script runs in the target Python and compiles the requested files.
+COMPILE_SCRIPT = """
+import json, py_compile, sys
+for source, target, display in json.load(sys.stdin):
+    py_compile.compile(source, cfile=target, dfile=display, doraise=True,
+                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+"""
+
+
+class Entry:
+    """An entry of the cpio archive."""
+
+    def __init__(self, name, mode, mtime, source=None):
+        """Create a new entry.
+
+        :param name: a path in the archive
+        :param mode: a file mode including the file type
+        :param mtime: a modification time
+        :param source: a path to a file with the content or None
+        """
+        self.name = name
+        self.mode = mode
+        self.mtime = int(mtime)
+        self.source = source
+
+    def read(self):
+        """Read the content of the entry."""
+        if self.source is None:
+            return b""
+
+        with open(self.source, "rb") as f:
+            return f.read()
+
+
+def get_file_hash(path):
+    """Get a hash of the given file."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_cache_tag(python):
+    """Get the bytecode cache tag of the given Python interpreter."""
+    return subprocess.check_output(
+        [python, "-c", "import sys; print(sys.implementation.cache_tag)"],
+        universal_newlines=True
+    ).strip()
+
+
+def collect_sources():
+    """Collect the files to put to the image.
+
+    :return: a list of tuples with a path in the image and a path to the source
+    """
+    sources = []
+    addon_dir = os.path.join(REPOSITORY_DIR, ADDON_NAME)
+
+    for root, dirs, files in os.walk(addon_dir):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        relative_root = os.path.relpath(root, REPOSITORY_DIR)
+
+        for name in sorted(files):
+            if name.endswith((".pyc", ".pyo")):
+                continue
+
+            sources.append((
+                os.path.join(ADDONS_DIR, relative_root, name),
+                os.path.join(root, name)
+            ))
+
+    data_dir = os.path.join(REPOSITORY_DIR, "data")
+
+    for name in sorted(os.listdir(data_dir)):
+        if not name.startswith("org.fedoraproject.Anaconda.Addons."):
+            continue
+
+        if name.endswith(".service"):
+            sources.append((os.path.join(SERVICES_DIR, name), os.path.join(data_dir, name)))
+        elif name.endswith(".conf"):
+            sources.append((os.path.join(CONFS_DIR, name), os.path.join(data_dir, name)))
+
+    return sources
+
+
+def get_bytecode_name(name, tag):
+    """Get a path of the compiled bytecode of the given module."""
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, "__pycache__", "{}.{}.pyc".format(filename[:-3], tag))
+
+
+def compile_sources(sources, hashes, python, tag, cache_dir):
+    """Compile Python sources to bytecode with the target Python.
+
+    Compiled files are reused from the cache if their sources haven't changed.
+
+    :param sources: a list of tuples with a path in the image and a path to the source
+    :param hashes: a dictionary of hashes of the sources
+    :param python: a path to the target Python interpreter
+    :param tag: a bytecode cache tag of the target Python
+    :param cache_dir: a path to the cache directory
+    :return: a list of tuples with a path in the image and a path to the compiled file
+    """
+    compiled = []
+    requests = []
+    pyc_dir = os.path.join(cache_dir, "pyc")
+    os.makedirs(pyc_dir, exist_ok=True)
+
+    for name, source in sources:
+        if not name.endswith(".py"):
+            continue
+
+        # The path in tracebacks is part of the bytecode.
+        display = "/" + name
+        key = hashlib.sha256((hashes[source] + display).encode()).hexdigest()
+        target = os.path.join(pyc_dir, "{}.{}.pyc".format(key, tag))
+
+        compiled.append((get_bytecode_name(name, tag), target))
+
+        if not os.path.exists(target):
+            requests.append((source, target, display))
+
+    if requests:
+        subprocess.run(
+            [python, "-c", COMPILE_SCRIPT],
+            input=json.dumps(requests),
+            universal_newlines=True,
+            check=True
+        )
+
+    return compiled
+
+
+def create_entries(sources, compiled):
+    """Create entries of the archive including all parent directories.
+
+    :param sources: a list of tuples with a path in the image and a path to the source
+    :param compiled: a list of tuples with a path in the image and a path to the compiled file
+    :return: a sorted list of entries
+    """
+    entries = {}
+    mtime = max(os.stat(source).st_mtime for _name, source in sources)
+
+    for name, source in sources:
+        stat = os.stat(source)
+        entries[name] = Entry(name, stat.st_mode, stat.st_mtime, source=source)
+
+    for name, source in compiled:
+        # Use the mode of a regular read-only file for the bytecode.
+        entries[name] = Entry(name, 0o100644, mtime, source=source)
+
+    for name in list(entries):
+        directory = os.path.dirname(name)
+
+        while directory and directory not in entries:
+            entries[directory] = Entry(directory, 0o40755, mtime)
+            directory = os.path.dirname(directory)
+
+    entries["."] = Entry(".", 0o40755, mtime)
+    return [entries[name] for name in sorted(entries)]
+
+
+def write_cpio(entries):
+    """Create a cpio archive in the newc format.
+
+    :param entries: a list of entries
+    :return: the archive
+    """
+    chunks = []
+
+    def add_entry(inode, name, mode, mtime, data):
+        encoded_name = name.encode() + b"\0"
+        nlink = 2 if mode & 0o40000 else 1
+        header = "070701" + "".join("{:08X}".format(value) for value in (
+            inode, mode, 0, 0, nlink, mtime, len(data), 0, 0, 0, 0, len(encoded_name), 0
+        ))
+        chunks.append(header.encode())
+        chunks.append(encoded_name)
+        chunks.append(b"\0" * (-(len(header) + len(encoded_name)) % 4))
+        chunks.append(data)
+        chunks.append(b"\0" * (-len(data) % 4))
+
+    for inode, entry in enumerate(entries, start=1):
+        name = entry.name if entry.name == "." else "./" + entry.name
+        add_entry(inode, name, entry.mode, entry.mtime, entry.read())
+
+    add_entry(0, "TRAILER!!!", 0, 0, b"")
+    return b"".join(chunks)
+
+
+def compress_block(block, level):
+    """Compress one block into a complete gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush()
+
+
+def compress(data, level, block_size, jobs):
+    """Compress the data with gzip in parallel blocks.
+
+    :param data: the data to compress
+    :param level: a compression level
+    :param block_size: a size of a block
+    :param jobs: a number of parallel jobs
+    :return: the compressed data
+    """
+    blocks = [data[i:i + block_size] for i in range(0, len(data), block_size)] or [b""]
+
+    # The zlib module releases GIL, so threads are enough.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        members = executor.map(lambda block: compress_block(block, level), blocks)
+        return b"".join(members)
+
+
+def get_manifest(entries, hashes, options):
+    """Get a manifest of the image to detect changes."""
+    items = [
+        [entry.name, entry.mode, hashes.get(entry.source, entry.source)]
+        for entry in entries
+    ]
+    return json.dumps({"options": options, "entries": items}, sort_keys=True)
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Build an updates image with the addon.")
+    parser.add_argument(
+        "-o", "--output", default=os.path.join(REPOSITORY_DIR, DEFAULT_OUTPUT),
+        help="a path to the updates image (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--python", default=sys.executable,
+        help="the Python interpreter of the installation environment (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--no-bytecode", dest="bytecode", action="store_false",
+        help="don't add compiled bytecode to the image"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(),
+        help="a number of parallel compression jobs (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--level", type=int, default=9, choices=range(1, 10), metavar="1-9",
+        help="a gzip compression level (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+        help="a size of compressed blocks in bytes (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--cache-dir", default=os.path.join(REPOSITORY_DIR, DEFAULT_CACHE_DIR),
+        help="a directory for cached build results (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-f", "--force", action="store_true",
+        help="rebuild the image even if nothing has changed"
+    )
+    return parser.parse_args(argv)
+
+
+def is_up_to_date(output, manifest_path, manifest):
+    """Is the image built from the same files as described by the manifest?"""
+    if not os.path.exists(output) or not os.path.exists(manifest_path):
+        return False
+
+    with open(manifest_path) as f:
+        return f.read() == manifest
+
+
+def main(argv=None):
+    """Build the updates image."""
+    args = parse_args(argv)
+    start = time.monotonic()
+
+    sources = collect_sources()
+    hashes = {source: get_file_hash(source) for _name, source in sources}
+    compiled = []
+    tag = None
+
+    if args.bytecode:
+        tag = get_cache_tag(args.python)
+        compiled = compile_sources(sources, hashes, args.python, tag, args.cache_dir)
+
+    for _name, path in compiled:
+        hashes[path] = os.path.basename(path)
+
+    entries = create_entries(sources, compiled)
+    options = {"output": args.output, "tag": tag, "level": args.level}
+    manifest = get_manifest(entries, hashes, options)
+    manifest_path = os.path.join(args.cache_dir, "manifest.json")
+
+    if not args.force and is_up_to_date(args.output, manifest_path, manifest):
+        print("{} is up to date.".format(args.output))
+        return 0
+
+    image = compress(write_cpio(entries), args.level, args.block_size, max(args.jobs or 1, 1))
+
+    with open(args.output, "wb") as f:
+        f.write(image)
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    with open(manifest_path, "w") as f:
+        f.write(manifest)
+
+    print("Built {} ({} files, {} bytes) in {:.2f} s.".format(
+        args.output, len(entries), len(image), time.monotonic() - start
+    ))
+    print("Put it up where you can use it via")
+    print("  inst.updates=<path>/{}".format(os.path.basename(args.output)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())